@@ -11,4 +11,4 @@ def register_error_handlers(app: FastAPI) -> None:
     async def trace_validation_error_handler(
         request: Request, exc: TraceValidationError
     ) -> JSONResponse:
-        return JSONResponse(status_code=400, content=exc.to_response_body())
+        return JSONResponse(status_code=400, content=exc.response_body)
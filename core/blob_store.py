@@ -3,11 +3,49 @@
 from __future__ import annotations
 
 import hashlib
+import os
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import Executor
 from pathlib import Path
+from types import TracebackType
 from typing import Protocol
 
 from core.config import settings
 
+# Mode a plain open() gives new files under the process umask; read once at import,
+# since querying the umask means briefly setting it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_FILE_MODE = 0o666 & ~_UMASK
+
+
+# Incremental writer returned by BlobStore.open_write: blob_id is set by close(),
+# abort() discards the data, and the context manager closes or aborts on exit
+class BlobWriter(Protocol):
+    size: int
+    blob_id: str | None
+
+    def write(self, data: bytes) -> None:
+        ...
+
+    def close(self) -> str:
+        ...
+
+    def abort(self) -> None:
+        ...
+
+    def __enter__(self) -> BlobWriter:
+        ...
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        ...
+
 
 class BlobStore(Protocol):
     # Store bytes, return blob_id (sha256:hex)
@@ -18,6 +56,16 @@ class BlobStore(Protocol):
     def get_bytes(self, blob_id: str) -> bytes:
         ...
 
+    # Retrieve many blobs at once (optionally only their first max_bytes);
+    # missing or malformed blob_ids are left out
+    def get_many_bytes(
+        self,
+        blob_ids: Iterable[str],
+        executor: Executor | None = None,
+        max_bytes: int | None = None,
+    ) -> dict[str, bytes]:
+        ...
+
     # Return storage URI for a blob_id
     def get_uri(self, blob_id: str) -> str:
         ...
@@ -26,6 +74,11 @@ class BlobStore(Protocol):
     def exists(self, blob_id: str) -> bool:
         ...
 
+    # Open an incremental writer; its blob_id is known once closed
+    def open_write(self) -> BlobWriter:
+        ...
+
+
 # Layout: {root}/sha256/{first2chars}/{full_hash}
 class LocalFsBlobStore:
     def __init__(self, root: str | Path | None = None) -> None:
@@ -62,6 +115,32 @@ class LocalFsBlobStore:
             raise FileNotFoundError(f"Blob not found: {blob_id}")
         return path.read_bytes()
 
+    # Each distinct blob is read once, on the executor when one is given; unbuffered
+    # opens let readall() size the read from fstat instead of growing a buffer
+    def get_many_bytes(
+        self,
+        blob_ids: Iterable[str],
+        executor: Executor | None = None,
+        max_bytes: int | None = None,
+    ) -> dict[str, bytes]:
+        unique_ids = list(dict.fromkeys(blob_ids))
+        read = executor.map if executor is not None else map
+        sizes = [-1 if max_bytes is None else max_bytes] * len(unique_ids)
+        return {
+            blob_id: data
+            for blob_id, data in zip(unique_ids, read(self._read_or_none, unique_ids, sizes))
+            if data is not None
+        }
+
+    # size=-1 reads the whole blob
+    def _read_or_none(self, blob_id: str, size: int = -1) -> bytes | None:
+        try:
+            path = self._blob_path(self._parse_blob_id(blob_id))
+            with open(path, "rb", buffering=0) as f:
+                return f.read(size)
+        except (OSError, ValueError):
+            return None
+
     def get_uri(self, blob_id: str) -> str:
         hex_hash = self._parse_blob_id(blob_id)
         path = self._blob_path(hex_hash)
@@ -70,3 +149,71 @@ class LocalFsBlobStore:
     def exists(self, blob_id: str) -> bool:
         hex_hash = self._parse_blob_id(blob_id)
         return self._blob_path(hex_hash).exists()
+
+    def open_write(self) -> LocalFsBlobWriter:
+        return LocalFsBlobWriter(self)
+
+
+# Streams bytes to a temp file under {root}/tmp while hashing them, then moves
+# the file into the content-addressed layout on close; peak memory is one buffer
+class LocalFsBlobWriter:
+    _BUFFER_SIZE = 64 * 1024
+
+    def __init__(self, store: LocalFsBlobStore) -> None:
+        tmp_dir = store._root / "tmp"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=tmp_dir)
+        # mkstemp creates 0600 files; match the mode put_bytes blobs get
+        os.fchmod(fd, _FILE_MODE)
+        self._store = store
+        self._tmp_path = Path(tmp_name)
+        self._fp = os.fdopen(fd, "wb", buffering=self._BUFFER_SIZE)
+        self._hasher = hashlib.sha256()
+        self.size = 0
+        self.blob_id: str | None = None
+        self._aborted = False
+
+    def write(self, data: bytes) -> None:
+        self._fp.write(data)
+        self._hasher.update(data)
+        self.size += len(data)
+
+    def close(self) -> str:
+        if self.blob_id is not None:
+            return self.blob_id
+        if self._aborted:
+            raise ValueError("Blob writer was aborted")
+        self._fp.close()
+        hex_hash = self._hasher.hexdigest()
+        path = self._store._blob_path(hex_hash)
+        if path.exists():
+            self._tmp_path.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._tmp_path, path)
+        self.blob_id = f"sha256:{hex_hash}"
+        return self.blob_id
+
+    # Drop everything written so far without storing a blob; a no-op once closed
+    def abort(self) -> None:
+        if self.blob_id is not None:
+            return
+        self._aborted = True
+        self._fp.close()
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> LocalFsBlobWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._aborted:
+            return
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -22,6 +22,19 @@ class Settings(BaseSettings):
     JUDGE_MODEL: str = "gpt-5.2"
     OPENAI_API_KEY: str = ""
 
+    # Judge response cache (exact match on model + prompt + packet); empty dir disables it
+    JUDGE_CACHE_DIR: str = ""
+    JUDGE_CACHE_TTL: int = 7 * 24 * 3600
+
+    # Max LLM calls in flight per batched qa.run_judge flush
+    JUDGE_BATCH_CONCURRENCY: int = 8
+
+    # Per-request read timeout for judge calls; long streamed completions need minutes
+    JUDGE_REQUEST_TIMEOUT_SECONDS: float = 600.0
+
+    # Judge model input window; trace events past it are left out of the packet
+    JUDGE_CONTEXT_TOKENS: int = 272_000
+
     model_config = {"env_prefix": "", "case_sensitive": True, "env_file": ".env"}
 
 
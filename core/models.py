@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import uuid
 from enum import Enum
-from typing import Annotated, Literal, Union
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -293,6 +292,7 @@ class NavigationPayload(BaseModel):
 # Payload type mapping
 # ---------------------------------------------------------------------------
 
+# Event.type selects the payload schema directly, so validation never tries union arms
 PAYLOAD_TYPE_MAP: dict[EventType, type[BaseModel]] = {
     EventType.file_edit: FileEditPayload,
     EventType.file_snapshot: FileSnapshotPayload,
@@ -307,24 +307,6 @@ PAYLOAD_TYPE_MAP: dict[EventType, type[BaseModel]] = {
     EventType.navigation: NavigationPayload,
 }
 
-# Discriminated union type for payloads
-EventPayload = Annotated[
-    Union[
-        FileEditPayload,
-        FileSnapshotPayload,
-        TerminalCommandPayload,
-        TerminalOutputPayload,
-        TestRunPayload,
-        ThoughtPayload,
-        CommitPayload,
-        PRMetadataPayload,
-        ErrorPayload,
-        DebugActionPayload,
-        NavigationPayload,
-    ],
-    Field(discriminator=None),
-]
-
 
 # ---------------------------------------------------------------------------
 # Event model
@@ -346,8 +328,11 @@ class Event(BaseModel):
 
 
 # Request body for POST /traces/{trace_id}/events
+MAX_EVENTS_PER_BATCH = 100
+
+
 class EventBatch(BaseModel):
-    events: list[Event] = Field(..., min_length=1, max_length=100)
+    events: list[Event] = Field(..., min_length=1, max_length=MAX_EVENTS_PER_BATCH)
 
 
 # ---------------------------------------------------------------------------
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from functools import cached_property
+
 from pydantic import ValidationError
 
 from core.models import (
@@ -9,6 +11,7 @@ from core.models import (
     EventBatch,
     EventType,
     FinalizeRequest,
+    MAX_EVENTS_PER_BATCH,
     PAYLOAD_TYPE_MAP,
     TraceCreate,
 )
@@ -34,12 +37,17 @@ class TraceValidationError(Exception):
         self.errors = errors
         super().__init__(f"{len(errors)} validation error(s)")
 
-    def to_response_body(self) -> dict:
+    # Built on first access; the handler and any logging share the same dict
+    @cached_property
+    def response_body(self) -> dict:
         return {
             "detail": "Validation failed",
             "errors": [e.to_dict() for e in self.errors],
         }
 
+    def to_response_body(self) -> dict:
+        return self.response_body
+
 
 # Convert Pydantic ValidationError to our structured error format
 def _pydantic_errors_to_details(exc: ValidationError) -> list[ValidationErrorDetail]:
@@ -64,6 +72,14 @@ def validate_trace_create(data: dict) -> TraceCreate:
 
 # Validate a POST /traces/{trace_id}/events request body
 def validate_event_batch(data: dict) -> EventBatch:
+    # Reject oversize batches before Pydantic validates every event in them
+    events = data.get("events") if isinstance(data, dict) else None
+    if isinstance(events, list) and len(events) > MAX_EVENTS_PER_BATCH:
+        raise TraceValidationError([ValidationErrorDetail(
+            field="events",
+            message=f"At most {MAX_EVENTS_PER_BATCH} events per batch, got {len(events)}",
+        )])
+
     # Phase 1: envelope validation
     try:
         batch = EventBatch.model_validate(data)
@@ -2,7 +2,7 @@
 
 import uuid
 
-from sqlalchemy import BigInteger, ForeignKey, Index, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, ForeignKey, Index, String, Text, UniqueConstraint, cast, func
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -34,6 +34,11 @@ class TraceRow(Base):
     )
 
 
+# qa_json as raw JSON text (SQL NULL for a missing or JSON-null value), so workers
+# can hand it straight to QA.model_validate_json instead of decoding to a dict first
+qa_json_text = func.nullif(cast(TraceRow.qa_json, Text), "null").label("qa_json_text")
+
+
 class EventRow(Base):
     __tablename__ = "events"
     __table_args__ = (
@@ -0,0 +1,57 @@
+"""Partial updates of traces.qa_json shared by the QA workers"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import cast, column, func, select, update
+from sqlalchemy import values as values_clause
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Text
+
+from core.models import QA
+from db.models import TraceRow, qa_json_text
+
+
+# Merge each trace's top-level keys into its qa_json and set any extra columns
+# (e.g. status). Traces that no longer exist are skipped and returned, so callers
+# do not chain further work onto them
+def merge_qa_json(
+    session: Session, patches: dict[str, dict[str, Any]], **values: Any
+) -> set[str]:
+    if not patches:
+        return set()
+    if session.get_bind().dialect.name == "postgresql":
+        # jsonb || jsonb replaces top-level keys in the database: only the patch is
+        # sent, and concurrent writers to other keys cannot clobber each other. One
+        # UPDATE ... FROM (VALUES ...) covers every trace, since drivers cannot
+        # return rows from an executemany UPDATE. VALUES columns are untyped in
+        # Postgres, so the ids and patches are cast explicitly
+        patch_rows = values_clause(
+            column("trace_id", Text), column("patch", JSONB), name="patches"
+        ).data(list(patches.items()))
+        updated = session.execute(
+            update(TraceRow)
+            .where(TraceRow.trace_id == cast(patch_rows.c.trace_id, UUID))
+            .values(
+                qa_json=func.coalesce(TraceRow.qa_json, func.jsonb_build_object())
+                .op("||")(cast(patch_rows.c.patch, JSONB)),
+                **values,
+            )
+            .returning(TraceRow.trace_id)
+        ).scalars()
+        return set(patches) - {str(trace_id) for trace_id in updated}
+
+    # Elsewhere (SQLite in tests): read, merge over the validated QA, write back
+    current = session.execute(
+        select(TraceRow.trace_id, qa_json_text).where(TraceRow.trace_id.in_(list(patches)))
+    ).all()
+    for trace_id, qa_text in current:
+        existing_qa = QA.model_validate_json(qa_text) if qa_text else QA()
+        session.execute(
+            update(TraceRow)
+            .where(TraceRow.trace_id == trace_id)
+            .values(qa_json={**existing_qa.model_dump(), **patches[str(trace_id)]}, **values)
+        )
+    return set(patches) - {str(trace_id) for trace_id, _ in current}
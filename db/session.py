@@ -4,6 +4,7 @@ from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager, contextmanager
 from collections.abc import Generator
 
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
@@ -11,11 +12,31 @@ from sqlalchemy.orm import Session, sessionmaker
 from core.config import settings
 from db.models import Base
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+
+# orjson for JSON/JSONB columns (qa_json, payload_json, ...); SQLAlchemy wants str back
+def json_serializer(value: object) -> str:
+    return orjson.dumps(value).decode()
+
+
+# Larger compiled-statement cache (default 500): the API and workers reuse a
+# small set of Core/ORM statements, so they should never be evicted
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    query_cache_size=1200,
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
+)
 async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
 # Sync engine + session for Celery workers
-sync_engine = create_engine(settings.DATABASE_URL_SYNC, echo=False)
+sync_engine = create_engine(
+    settings.DATABASE_URL_SYNC,
+    echo=False,
+    query_cache_size=1200,
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
+)
 sync_session_factory = sessionmaker(sync_engine, expire_on_commit=False)
 
 
@@ -0,0 +1,113 @@
+"""Shared pytest setup: SQLite settings, Postgres type patches, one sync engine"""
+
+from __future__ import annotations
+
+# Must set DB URLs before importing any project modules that trigger
+# db/session.py module-level engine creation
+import os
+
+os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
+os.environ["DATABASE_URL_SYNC"] = "sqlite://"
+
+import uuid  # noqa: E402
+
+import orjson  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy import JSON, BigInteger, Integer, String, create_engine, event  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB, UUID  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+from sqlalchemy.types import TypeDecorator  # noqa: E402
+
+from db.models import Base  # noqa: E402
+from db.session import json_serializer  # noqa: E402
+
+
+# UUID column stand-in for SQLite: binds uuid.UUID values as their string form,
+# so no global sqlite3 adapter is needed
+class UUIDString(TypeDecorator):
+    impl = String(36)
+    cache_ok = True
+
+    def process_bind_param(self, value: uuid.UUID | str | None, dialect) -> str | None:
+        return None if value is None else str(value)
+
+
+# ---------------------------------------------------------------------------
+# Patch PostgreSQL-specific column types for SQLite compatibility
+# ---------------------------------------------------------------------------
+
+# Runs once per session, before any engine fixture builds the schema
+@pytest.fixture(scope="session", autouse=True)
+def _patch_pg_types_for_sqlite() -> None:
+    for table in Base.metadata.tables.values():
+        for col in table.columns:
+            if isinstance(col.type, JSONB):
+                col.type = JSON()
+            elif isinstance(col.type, UUID):
+                col.type = UUIDString()
+            elif isinstance(col.type, BigInteger) and col.primary_key:
+                # SQLite requires INTEGER (not BIGINT) for autoincrement primary keys
+                col.type = Integer()
+
+
+# ---------------------------------------------------------------------------
+# Sync engine for worker tests
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session")
+def sync_engine():
+    # Named shared-cache in-memory DB behind a StaticPool: every checkout reuses
+    # the one connection that holds the schema, from any thread. The name carries
+    # the xdist worker id so each worker's database is distinct by name too
+    worker_id = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    engine = create_engine(
+        f"sqlite:///file:datacurve_test_{worker_id}?mode=memory&cache=shared&uri=true",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+        query_cache_size=1200,
+        json_serializer=json_serializer,
+        json_deserializer=orjson.loads,
+        echo=False,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _connection_record):
+        # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs behave under pysqlite
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sync_connection(sync_engine):
+    # Each test runs inside an outer transaction that is rolled back afterwards
+    connection = sync_engine.connect()
+    transaction = connection.begin()
+    try:
+        yield connection
+    finally:
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def sync_session_factory(sync_connection):
+    # Sessions share the test's connection, so task writes are visible to the
+    # test's own sync_session at once; commit() only releases a SAVEPOINT
+    return sessionmaker(
+        bind=sync_connection, join_transaction_mode="create_savepoint", autoflush=False
+    )
+
+
+@pytest.fixture
+def sync_session(sync_session_factory):
+    session = sync_session_factory()
+    yield session
+    session.close()
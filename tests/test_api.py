@@ -2,76 +2,58 @@
 
 from __future__ import annotations
 
-# Must set DATABASE_URL before importing any project modules that trigger
-# db/session.py module-level engine creation
-import os
-os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
-
-import sqlite3
 import uuid
+from unittest.mock import MagicMock, patch
 
-# Register UUID adapter so SQLite can bind uuid.UUID objects as strings
-sqlite3.register_adapter(uuid.UUID, str)
-
+import orjson
 import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
-from sqlalchemy import JSON, Integer, String
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
-from db.models import Base, BlobRow, EventRow, TraceRow
-
-# ---------------------------------------------------------------------------
-# Patch PostgreSQL-specific column types for SQLite compatibility
-# ---------------------------------------------------------------------------
-
-_JSONB_COLUMNS = [
-    TraceRow.repo_json, TraceRow.task_json, TraceRow.developer_json,
-    TraceRow.environment_json, TraceRow.ingestion_json,
-    TraceRow.final_state_json, TraceRow.qa_json,
-    EventRow.actor_json, EventRow.context_json, EventRow.payload_json,
-    BlobRow.redaction_json,
-]
-
-for _col in _JSONB_COLUMNS:
-    _col.property.columns[0].type = JSON()
-
-for _col in [TraceRow.trace_id, EventRow.trace_id, EventRow.event_id]:
-    _col.property.columns[0].type = String(36)
-
-# SQLite requires INTEGER (not BIGINT) for autoincrement primary keys
-EventRow.id.property.columns[0].type = Integer()
-
+from api.main import app
+from api.routes.blobs import get_blob_store
+from core.blob_store import LocalFsBlobStore
+from db.models import Base
+from db.session import get_session_dep, json_serializer
 
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest_asyncio.fixture
+# One engine for the whole run so its compiled-statement cache stays warm;
+# the in-memory DB lives on the engine's single pooled connection
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
 async def db_engine():
-    engine = create_async_engine("sqlite+aiosqlite://", echo=False)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        query_cache_size=1200,
+        json_serializer=json_serializer,
+        json_deserializer=orjson.loads,
+    )
     yield engine
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
     await engine.dispose()
 
 
 @pytest_asyncio.fixture
 async def db_session(db_engine):
+    async with db_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     session_factory = async_sessionmaker(db_engine, expire_on_commit=False)
     async with session_factory() as session:
         yield session
+    async with db_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
 
 
-@pytest_asyncio.fixture
-async def client(db_session: AsyncSession, tmp_path):
-    from api.main import app
-    from db.session import get_session_dep
-    from api.routes.blobs import get_blob_store
-    from core.blob_store import LocalFsBlobStore
+# Blob store is content-addressed, so one root can be shared by every test
+@pytest.fixture(scope="session")
+def blob_root(tmp_path_factory):
+    return tmp_path_factory.mktemp("blobs", numbered=False)
 
+
+@pytest_asyncio.fixture
+async def client(db_session: AsyncSession, blob_root):
     async def override_session():
         try:
             yield db_session
@@ -80,25 +62,30 @@ async def client(db_session: AsyncSession, tmp_path):
             await db_session.rollback()
             raise
 
-    blob_store = LocalFsBlobStore(root=tmp_path / "blobs")
+    blob_store = LocalFsBlobStore(root=blob_root)
 
     app.dependency_overrides[get_session_dep] = override_session
     app.dependency_overrides[get_blob_store] = lambda: blob_store
 
-    from unittest.mock import patch, MagicMock
-
     transport = ASGITransport(app=app, raise_app_exceptions=False)
     with patch("worker.celery_app.celery_app.send_task", new_callable=MagicMock):
         async with AsyncClient(transport=transport, base_url="http://test") as ac:
             yield ac
 
-    app.dependency_overrides.clear()
+    # Remove only the overrides this fixture installed
+    app.dependency_overrides.pop(get_session_dep, None)
+    app.dependency_overrides.pop(get_blob_store, None)
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+# Request kwargs with the body pre-encoded by orjson instead of httpx's stdlib json
+def _json(body: dict) -> dict:
+    return {"content": orjson.dumps(body), "headers": {"content-type": "application/json"}}
+
+
 def _trace_body() -> dict:
     return {
         "repo": {
@@ -140,7 +127,7 @@ def _event(seq: int, event_id: str | None = None) -> dict:
 
 @pytest.mark.asyncio
 async def test_create_trace_returns_201(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     assert resp.status_code == 201
     data = resp.json()
     assert "trace_id" in data
@@ -152,7 +139,7 @@ async def test_create_trace_returns_201(client: AsyncClient):
 async def test_create_trace_missing_field_returns_400(client: AsyncClient):
     body = _trace_body()
     del body["repo"]
-    resp = await client.post("/traces", json=body)
+    resp = await client.post("/traces", **_json(body))
     assert resp.status_code == 400
     data = resp.json()
     assert "errors" in data
@@ -164,11 +151,11 @@ async def test_create_trace_missing_field_returns_400(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_append_events_returns_202(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     events_body = {"events": [_event(1), _event(2)]}
-    resp = await client.post(f"/traces/{trace_id}/events", json=events_body)
+    resp = await client.post(f"/traces/{trace_id}/events", **_json(events_body))
     assert resp.status_code == 202
     data = resp.json()
     assert data["accepted"] == 2
@@ -177,31 +164,31 @@ async def test_append_events_returns_202(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_append_events_duplicate_event_id_returns_409(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     eid = str(uuid.uuid4())
     events_body = {"events": [_event(1, event_id=eid)]}
-    resp = await client.post(f"/traces/{trace_id}/events", json=events_body)
+    resp = await client.post(f"/traces/{trace_id}/events", **_json(events_body))
     assert resp.status_code == 202
 
     # Send same event_id again
     events_body2 = {"events": [_event(2, event_id=eid)]}
-    resp = await client.post(f"/traces/{trace_id}/events", json=events_body2)
+    resp = await client.post(f"/traces/{trace_id}/events", **_json(events_body2))
     assert resp.status_code == 409
 
 
 @pytest.mark.asyncio
 async def test_append_events_non_monotonic_seq_returns_400(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     events_body = {"events": [_event(1)]}
-    await client.post(f"/traces/{trace_id}/events", json=events_body)
+    await client.post(f"/traces/{trace_id}/events", **_json(events_body))
 
     # seq=1 again — not monotonically increasing
     events_body2 = {"events": [_event(1)]}
-    resp = await client.post(f"/traces/{trace_id}/events", json=events_body2)
+    resp = await client.post(f"/traces/{trace_id}/events", **_json(events_body2))
     assert resp.status_code == 400
 
 
@@ -209,7 +196,7 @@ async def test_append_events_non_monotonic_seq_returns_400(client: AsyncClient):
 async def test_append_events_nonexistent_trace_returns_404(client: AsyncClient):
     fake_id = str(uuid.uuid4())
     events_body = {"events": [_event(1)]}
-    resp = await client.post(f"/traces/{fake_id}/events", json=events_body)
+    resp = await client.post(f"/traces/{fake_id}/events", **_json(events_body))
     assert resp.status_code == 404
 
 
@@ -219,11 +206,11 @@ async def test_append_events_nonexistent_trace_returns_404(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_finalize_returns_200(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     finalize_body = {"final_state": {"commit_head": "def456"}}
-    resp = await client.post(f"/traces/{trace_id}/finalize", json=finalize_body)
+    resp = await client.post(f"/traces/{trace_id}/finalize", **_json(finalize_body))
     assert resp.status_code == 200
     data = resp.json()
     assert data["status"] == "finalizing"
@@ -232,14 +219,14 @@ async def test_finalize_returns_200(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_double_finalize_returns_409(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     finalize_body = {"final_state": {"commit_head": "def456"}}
-    resp = await client.post(f"/traces/{trace_id}/finalize", json=finalize_body)
+    resp = await client.post(f"/traces/{trace_id}/finalize", **_json(finalize_body))
     assert resp.status_code == 200
 
-    resp = await client.post(f"/traces/{trace_id}/finalize", json=finalize_body)
+    resp = await client.post(f"/traces/{trace_id}/finalize", **_json(finalize_body))
     assert resp.status_code == 409
 
 
@@ -249,11 +236,11 @@ async def test_double_finalize_returns_409(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_get_trace_returns_full_trace(client: AsyncClient):
-    resp = await client.post("/traces", json=_trace_body())
+    resp = await client.post("/traces", **_json(_trace_body()))
     trace_id = resp.json()["trace_id"]
 
     events_body = {"events": [_event(1)]}
-    await client.post(f"/traces/{trace_id}/events", json=events_body)
+    await client.post(f"/traces/{trace_id}/events", **_json(events_body))
 
     resp = await client.get(f"/traces/{trace_id}")
     assert resp.status_code == 200
@@ -288,6 +275,8 @@ async def test_blob_upload_returns_201(client: AsyncClient):
 
 @pytest.mark.asyncio
 async def test_blob_dedup_same_content(client: AsyncClient):
+    # Uploads stay sequential: both requests share the test's single AsyncSession,
+    # and the second must observe the BlobRow written by the first
     content = b"duplicate content"
     resp1 = await client.post(
         "/blobs",
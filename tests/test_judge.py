@@ -2,77 +2,29 @@
 
 from __future__ import annotations
 
+import json
 import os
-import uuid
-
-# Set sync DB URL to SQLite before importing project modules
-os.environ["DATABASE_URL_SYNC"] = "sqlite://"
-os.environ["DATABASE_URL"] = "sqlite+aiosqlite://"
-
-import sqlite3
-
-# Register UUID adapter so SQLite can bind uuid.UUID objects as strings
-sqlite3.register_adapter(uuid.UUID, str)
-
+import subprocess
+import sys
 import time
-from unittest.mock import patch
+import uuid
+from pathlib import Path
+from unittest.mock import MagicMock, patch
 
 import pytest
-from sqlalchemy import JSON, Integer, String, create_engine
-from sqlalchemy.orm import Session, sessionmaker
-
-from db.models import Base, BlobRow, EventRow, TraceRow
-
-# ---------------------------------------------------------------------------
-# Patch PostgreSQL-specific column types for SQLite compatibility
-# ---------------------------------------------------------------------------
-
-_JSONB_COLUMNS = [
-    TraceRow.repo_json, TraceRow.task_json, TraceRow.developer_json,
-    TraceRow.environment_json, TraceRow.ingestion_json,
-    TraceRow.final_state_json, TraceRow.qa_json,
-    EventRow.actor_json, EventRow.context_json, EventRow.payload_json,
-    BlobRow.redaction_json,
-]
-
-for _col in _JSONB_COLUMNS:
-    _col.property.columns[0].type = JSON()
-
-for _col in [TraceRow.trace_id, EventRow.trace_id, EventRow.event_id]:
-    _col.property.columns[0].type = String(36)
-
-EventRow.id.property.columns[0].type = Integer()
+from sqlalchemy.orm import Session
 
+from db.models import EventRow, TraceRow
 
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest.fixture
-def sync_engine():
-    engine = create_engine("sqlite://", echo=False)
-    Base.metadata.create_all(engine)
-    yield engine
-    Base.metadata.drop_all(engine)
-    engine.dispose()
-
-
-@pytest.fixture
-def sync_session_factory(sync_engine):
-    return sessionmaker(sync_engine, expire_on_commit=False)
-
-
-@pytest.fixture
-def sync_session(sync_session_factory):
-    session = sync_session_factory()
-    yield session
-    session.close()
-
-
 @pytest.fixture
 def trace_id_with_events(sync_session: Session) -> str:
     # Create a trace in 'finalizing' state with events and test results
     tid = str(uuid.uuid4())
+    now_ms = int(time.time() * 1000)
     row = TraceRow(
         trace_id=tid,
         status="finalizing",
@@ -104,7 +56,7 @@ def trace_id_with_events(sync_session: Session) -> str:
                 "invocations": [
                     {
                         "invocation_id": str(uuid.uuid4()),
-                        "ts_ms": int(time.time() * 1000),
+                        "ts_ms": now_ms,
                         "command": "npm test",
                         "exit_code": 0,
                         "duration_ms": 5000,
@@ -114,67 +66,64 @@ def trace_id_with_events(sync_session: Session) -> str:
                 "final_passed": True,
             },
         },
-        created_at_ms=int(time.time() * 1000),
-        finalized_at_ms=int(time.time() * 1000),
+        created_at_ms=now_ms,
+        finalized_at_ms=now_ms,
     )
     sync_session.add(row)
     sync_session.commit()
 
-    # Add realistic events showing debugging process
-    events = [
-        EventRow(
-            trace_id=tid,
-            event_id=str(uuid.uuid4()),
-            seq=1,
-            ts_ms=int(time.time() * 1000),
-            type="thought",
-            actor_json={"kind": "human", "id": "dev-1"},
-            payload_json={
-                "content_blob_id": "",
-                "kind": "hypothesis",
-                "links_to": [],
-            },
-        ),
-        EventRow(
-            trace_id=tid,
-            event_id=str(uuid.uuid4()),
-            seq=2,
-            ts_ms=int(time.time() * 1000) + 1000,
-            type="file_edit",
-            actor_json={"kind": "human", "id": "dev-1"},
-            payload_json={
-                "file_path": "src/components/LoginButton.tsx",
-                "edit_kind": "patch",
-                "patch_blob_id": "sha256:abc123",
-            },
-        ),
+    # Add realistic events showing debugging process: (seq, ts offset, type, actor, payload)
+    human = {"kind": "human", "id": "dev-1"}
+    specs = [
+        (1, 0, "thought", human, {
+            "content_blob_id": "",
+            "kind": "hypothesis",
+            "links_to": [],
+        }),
+        (2, 1000, "file_edit", human, {
+            "file_path": "src/components/LoginButton.tsx",
+            "edit_kind": "patch",
+            "patch_blob_id": "sha256:abc123",
+        }),
+        (3, 2000, "test_run", {"kind": "ide", "id": None}, {
+            "command": "npm test",
+            "runner": "npm test",
+            "exit_code": 0,
+            "duration_ms": 3000,
+            "passed": True,
+        }),
+    ]
+    sync_session.add_all([
         EventRow(
             trace_id=tid,
             event_id=str(uuid.uuid4()),
-            seq=3,
-            ts_ms=int(time.time() * 1000) + 2000,
-            type="test_run",
-            actor_json={"kind": "ide", "id": None},
-            payload_json={
-                "command": "npm test",
-                "runner": "npm test",
-                "exit_code": 0,
-                "duration_ms": 3000,
-                "passed": True,
-            },
-        ),
-    ]
-    for event in events:
-        sync_session.add(event)
+            seq=seq,
+            ts_ms=now_ms + offset_ms,
+            type=event_type,
+            actor_json=actor,
+            payload_json=payload,
+        )
+        for seq, offset_ms, event_type, actor, payload in specs
+    ])
     sync_session.commit()
 
     return tid
 
 
+@pytest.fixture(autouse=True)
+def _no_async_engine(monkeypatch):
+    # Surface any accidental aiosqlite usage on the judge path
+    monkeypatch.setattr("db.session.engine", None)
+    monkeypatch.setattr("db.session.async_session_factory", None)
+
+
 def _patch_judge_sync_session(sync_session_factory):
     # Return a context manager patch for get_sync_session for judge module
     from contextlib import contextmanager
 
+    # Judge tests must stay on the stdlib sqlite3 driver, not aiosqlite
+    assert sync_session_factory.kw["bind"].engine.url.drivername == "sqlite"
+
     @contextmanager
     def _test_sync_session():
         session = sync_session_factory()
@@ -194,7 +143,9 @@ def _patch_judge_sync_session(sync_session_factory):
 # Tests: run_judge with real OpenAI API
 # ---------------------------------------------------------------------------
 
-def test_run_judge_success_real_api(sync_session_factory, trace_id_with_events, tmp_path):
+def test_run_judge_success_real_api(
+    sync_session_factory, sync_session, trace_id_with_events, tmp_path
+):
     # Test successful judge execution with real OpenAI API call
     from core.blob_store import LocalFsBlobStore
     blob_store = LocalFsBlobStore(root=tmp_path / "blobs")
@@ -202,7 +153,7 @@ def test_run_judge_success_real_api(sync_session_factory, trace_id_with_events,
     with (
         _patch_judge_sync_session(sync_session_factory),
         patch("worker.tasks.judge.blob_store", blob_store),
-        patch("worker.tasks.judge.celery_app") as mock_celery,
+        patch("worker.tasks.judge.send_tasks_bulk") as mock_send,
     ):
         from worker.tasks.judge import _run_judge_impl
         result = _run_judge_impl(trace_id_with_events)
@@ -214,12 +165,11 @@ def test_run_judge_success_real_api(sync_session_factory, trace_id_with_events,
     assert isinstance(result["flags"], list)
 
     # Verify qa_json.judge was updated
-    session = sync_session_factory()
-    row = session.query(TraceRow).filter_by(trace_id=trace_id_with_events).first()
-    assert row.qa_json is not None
-    assert row.qa_json["judge"] is not None
+    qa_json = sync_session.get(TraceRow, trace_id_with_events, populate_existing=True).qa_json
+    assert qa_json is not None
+    assert qa_json["judge"] is not None
     
-    judge = row.qa_json["judge"]
+    judge = qa_json["judge"]
     assert judge["model"] == "gpt-5.2"
     assert judge["rubric_version"] == "1.0"
     
@@ -247,14 +197,18 @@ def test_run_judge_success_real_api(sync_session_factory, trace_id_with_events,
     
     # Verify flags is a list (may be empty or have valid flags)
     assert isinstance(judge["flags"], list)
-    valid_flags = ["hallucination_risk", "missing_steps", "unsafe_suggestion", "incomplete_fix", "exemplary_trace"]
+    valid_flags = [
+        "hallucination_risk",
+        "missing_steps",
+        "unsafe_suggestion",
+        "incomplete_fix",
+        "exemplary_trace",
+    ]
     for flag in judge["flags"]:
         assert flag in valid_flags, f"Invalid flag: {flag}"
-    
-    session.close()
 
     # Verify finalize_qa task was dispatched
-    mock_celery.send_task.assert_called_once_with("qa.finalize_qa", args=[trace_id_with_events])
+    mock_send.assert_called_once_with([("qa.finalize_qa", [trace_id_with_events])])
 
 
 def test_run_judge_trace_not_found(sync_session_factory, tmp_path):
@@ -267,7 +221,7 @@ def test_run_judge_trace_not_found(sync_session_factory, tmp_path):
     with (
         _patch_judge_sync_session(sync_session_factory),
         patch("worker.tasks.judge.blob_store", blob_store),
-        patch("worker.tasks.judge.celery_app"),
+        patch("worker.tasks.judge.send_tasks_bulk"),
     ):
         from worker.tasks.judge import _run_judge_impl
 
@@ -275,15 +229,267 @@ def test_run_judge_trace_not_found(sync_session_factory, tmp_path):
             _run_judge_impl(fake_trace_id)
 
 
+def test_run_judge_batch_reports_per_trace(
+    sync_session_factory, sync_session, trace_id_with_events, tmp_path
+):
+    from core.blob_store import LocalFsBlobStore
+    from core.models import JudgeOutput
+    blob_store = LocalFsBlobStore(root=tmp_path / "blobs")
+    missing_id = str(uuid.uuid4())
+    batch = [trace_id_with_events, missing_id, "not-a-uuid", trace_id_with_events]
+
+    from worker.tasks import judge
+    with (
+        _patch_judge_sync_session(sync_session_factory),
+        patch("worker.tasks.judge.blob_store", blob_store),
+        patch("worker.tasks.judge.send_tasks_bulk") as mock_send,
+        patch(
+            "worker.tasks.judge._call_llm_judge",
+            return_value=JudgeOutput.model_validate_json(_JUDGE_JSON),
+        ),
+        patch(
+            "worker.tasks.judge._load_judge_inputs", wraps=judge._load_judge_inputs
+        ) as spy_load,
+    ):
+        results = judge._run_judge_batch(batch)
+
+    assert results[trace_id_with_events]["overall"] == 4.0
+    assert isinstance(results[missing_id], ValueError)
+    # The malformed id fails on its own and never reaches the batched load
+    assert "Invalid trace id" in str(results["not-a-uuid"])
+    spy_load.assert_called_once_with([trace_id_with_events, missing_id])
+    trace = sync_session.get(TraceRow, trace_id_with_events, populate_existing=True)
+    assert trace.qa_json["judge"]["overall"] == 4.0
+    # One bulk dispatch for the batch, covering only the traces that were judged
+    mock_send.assert_called_once_with([("qa.finalize_qa", [trace_id_with_events])])
+
+
+def test_run_judge_batch_skips_finalize_for_deleted_trace(
+    sync_session_factory, sync_session, trace_id_with_events, tmp_path
+):
+    # A trace deleted mid-judging is reported and never chained to finalize_qa
+    from core.blob_store import LocalFsBlobStore
+    from core.models import JudgeOutput
+    blob_store = LocalFsBlobStore(root=tmp_path / "blobs")
+
+    with (
+        _patch_judge_sync_session(sync_session_factory),
+        patch("worker.tasks.judge.blob_store", blob_store),
+        patch("worker.tasks.judge.send_tasks_bulk") as mock_send,
+        patch(
+            "worker.tasks.judge._call_llm_judge",
+            return_value=JudgeOutput.model_validate_json(_JUDGE_JSON),
+        ),
+        patch("worker.tasks.judge.merge_qa_json", return_value={trace_id_with_events}),
+    ):
+        from worker.tasks.judge import _run_judge_batch
+        results = _run_judge_batch([trace_id_with_events])
+
+    assert "Trace not found" in str(results[trace_id_with_events])
+    mock_send.assert_not_called()
+
+
+def test_run_judge_skips_mark_failed_for_malformed_id():
+    from worker.tasks.judge import run_judge
+
+    valid_id = str(uuid.uuid4())
+    # run_judge only reads each SimpleRequest's args
+    requests = [MagicMock(args=[tid]) for tid in (valid_id, "not-a-uuid")]
+    with (
+        patch("worker.tasks.judge._load_judge_inputs", return_value={}),
+        patch("worker.tasks.judge._mark_failed") as mock_mark,
+    ):
+        run_judge.run(requests)
+
+    mock_mark.assert_called_once_with(valid_id, f"Trace not found: {valid_id}")
+
+
+@pytest.mark.parametrize("seconds_per_batch", [40.0, 400.0], ids=["llm_latency", "very_slow"])
+def test_slow_judge_batches_keep_fanning_out(seconds_per_batch: float):
+    from worker.tasks.judge import _JudgeBatchSizer, run_judge
+
+    sizer = run_judge.sizer_class(run_judge.flush_every)
+    assert isinstance(sizer, _JudgeBatchSizer)
+    for _ in range(10):
+        sizer.record(seconds_per_batch, sizer.size)
+        sizer.suggest()
+    assert sizer.size >= _JudgeBatchSizer.MIN_SIZE > 1
+
+
+def test_judge_batch_sizer_bounds_follow_high_concurrency():
+    # The class bounds are read from settings at import, so check them in a fresh
+    # interpreter: a concurrency above the default cap raises the cap with it
+    code = (
+        "from worker.tasks.judge import _JudgeBatchSizer as S\n"
+        "s = S(16)\n"
+        "s.record(0.01, 1)\n"
+        "print(S.MIN_SIZE, S.MAX_SIZE, s.suggest())\n"
+    )
+    env = {
+        **os.environ,
+        "JUDGE_BATCH_CONCURRENCY": "100",
+        "DATABASE_URL": "sqlite+aiosqlite://",
+        "DATABASE_URL_SYNC": "sqlite://",
+    }
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parents[1],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.split() == ["100", "100", "100"]
+
+
+# ---------------------------------------------------------------------------
+# Tests: _call_llm_judge with a mocked OpenAI client
+# ---------------------------------------------------------------------------
+
+_JUDGE_JSON = json.dumps({
+    "scores": {
+        "root_cause_identification": 4.0,
+        "plan_quality": 3.5,
+        "experiment_iterate_loop": 4.0,
+        "use_of_signals_tests_logs": 3.0,
+        "minimality_of_fix": 5.0,
+        "clarity": 4.5,
+    },
+    "overall": 4.0,
+    "rationale": "Mocked rationale.",
+    "flags": [],
+})
+
+
+def _chunk(content: str | None = None, usage: MagicMock | None = None) -> MagicMock:
+    chunk = MagicMock(usage=usage)
+    chunk.choices = [] if content is None else [
+        MagicMock(delta=MagicMock(content=content, refusal=None), finish_reason=None)
+    ]
+    return chunk
+
+
+def _mock_openai_stream(content: str = _JUDGE_JSON, piece: int = 7) -> MagicMock:
+    # Split mid-token, usage delivered in a final empty chunk
+    usage = MagicMock(prompt_tokens=1500)
+    usage.prompt_tokens_details.cached_tokens = 1280
+    chunks = [_chunk(content[i:i + piece]) for i in range(0, len(content), piece)]
+    stream = MagicMock()
+    stream.__iter__.return_value = iter([*chunks, _chunk(usage=usage)])
+    return stream
+
+
+def test_call_llm_judge_keeps_rubric_as_cacheable_prefix():
+    from worker.tasks.judge import SYSTEM_PROMPT, _call_llm_judge
+
+    with patch("worker.tasks.judge._get_openai") as mock_get_openai:
+        create = mock_get_openai.return_value.chat.completions.create
+        create.return_value = _mock_openai_stream()
+        output = _call_llm_judge("packet text")
+
+    assert output.overall == 4.0
+    kwargs = create.call_args.kwargs
+    assert kwargs["messages"][0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert "packet text" in kwargs["messages"][1]["content"]
+    assert kwargs["prompt_cache_key"]
+    assert kwargs["stream"] is True
+    assert kwargs["response_format"]["json_schema"]["strict"] is True
+
+
+def test_response_format_schema_is_strict():
+    from worker.tasks.judge import _RESPONSE_FORMAT
+
+    schema = _RESPONSE_FORMAT["json_schema"]["schema"]
+    for obj in (schema, schema["$defs"]["JudgeScores"]):
+        assert obj["additionalProperties"] is False
+        assert set(obj["required"]) == set(obj["properties"])
+    assert "minLength" not in schema["properties"]["rationale"]
+
+
+def test_call_llm_judge_rejects_truncated_stream():
+    from worker.tasks.judge import _call_llm_judge
+
+    with patch("worker.tasks.judge._get_openai") as mock_get_openai:
+        create = mock_get_openai.return_value.chat.completions.create
+        create.return_value = _mock_openai_stream(_JUDGE_JSON[:40])
+        with pytest.raises(ValueError, match="failed validation"):
+            _call_llm_judge("packet text")
+
+
+def test_get_openai_builds_client_once(monkeypatch):
+    from worker.tasks import judge
+
+    monkeypatch.setattr(judge, "_openai_client", None)
+    with patch("worker.tasks.judge.openai.OpenAI") as mock_openai:
+        first = judge._get_openai()
+        second = judge._get_openai()
+
+    assert first is second
+    mock_openai.assert_called_once()
+    # Streamed judgments can run for minutes; only the connect phase stays short
+    timeout = mock_openai.call_args.kwargs["timeout"]
+    assert timeout.read == judge.settings.JUDGE_REQUEST_TIMEOUT_SECONDS
+    assert timeout.connect == 10.0
+    # The pool is the SDK's own client type, so it matches the httpx build openai uses
+    assert isinstance(mock_openai.call_args.kwargs["http_client"], judge.openai.DefaultHttpxClient)
+
+
+def test_judge_cache_replays_identical_packet(monkeypatch, tmp_path):
+    from core.models import JudgeOutput
+    from worker.tasks import judge
+
+    monkeypatch.setattr(judge.settings, "JUDGE_CACHE_DIR", str(tmp_path / "judge_cache"))
+    expected = JudgeOutput.model_validate_json(_JUDGE_JSON)
+
+    with patch("worker.tasks.judge._call_llm_judge", return_value=expected) as mock_call:
+        first = judge._call_llm_judge_cached("same packet")
+        second = judge._call_llm_judge_cached("same packet")
+        judge._call_llm_judge_cached("different packet")
+
+    assert first == second == expected
+    assert [c.args[0] for c in mock_call.call_args_list] == ["same packet", "different packet"]
+
+
+def test_judge_cache_key_tracks_system_prompt(monkeypatch, tmp_path):
+    from worker.tasks import judge
+
+    monkeypatch.setattr(judge.settings, "JUDGE_CACHE_DIR", str(tmp_path / "judge_cache"))
+    before = judge._judge_cache_path("packet")
+    monkeypatch.setattr(judge, "_JUDGE_PROMPT_FINGERPRINT", "edited-prompt")
+    assert judge._judge_cache_path("packet") != before
+
+
+def test_judge_cache_is_best_effort(monkeypatch, tmp_path):
+    # A corrupt entry is a miss, and a failed write is logged without leaving temp files
+    from core.models import JudgeOutput
+    from worker.tasks import judge
+
+    monkeypatch.setattr(judge.settings, "JUDGE_CACHE_DIR", str(tmp_path / "judge_cache"))
+    expected = JudgeOutput.model_validate_json(_JUDGE_JSON)
+    path = judge._judge_cache_path("packet")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"{not json")
+
+    with (
+        patch("worker.tasks.judge._call_llm_judge", return_value=expected) as mock_call,
+        patch("worker.tasks.judge.os.replace", side_effect=OSError("disk full")),
+    ):
+        assert judge._call_llm_judge_cached("packet") == expected
+
+    mock_call.assert_called_once()
+    assert list(path.parent.iterdir()) == [path]
+
+
 # ---------------------------------------------------------------------------
 # Tests: build_judge_packet (no API calls needed)
 # ---------------------------------------------------------------------------
 
-def test_build_judge_packet_includes_bug_report():
-    # Test that judge packet includes bug report details
+@pytest.fixture(scope="module")
+def judge_packet() -> str:
+    # Build one packet covering every section; the tests below only check substrings
     from worker.tasks.judge import _build_judge_packet
 
-    packet = _build_judge_packet(
+    return _build_judge_packet(
         task_json={
             "bug_report": {
                 "title": "Test Bug",
@@ -293,24 +499,6 @@ def test_build_judge_packet_includes_bug_report():
                 "actual": "Actual behavior",
             }
         },
-        events_data=[],
-        final_state_json={},
-        qa_json={},
-    )
-
-    assert "Test Bug" in packet
-    assert "Bug description" in packet
-    assert "Step 1" in packet
-    assert "Expected behavior" in packet
-    assert "Actual behavior" in packet
-
-
-def test_build_judge_packet_includes_events():
-    # Test that judge packet includes event summaries
-    from worker.tasks.judge import _build_judge_packet
-
-    packet = _build_judge_packet(
-        task_json={"bug_report": {"title": "Bug", "description": "Desc"}},
         events_data=[
             {
                 "seq": 1,
@@ -325,24 +513,13 @@ def test_build_judge_packet_includes_events():
                 "payload_json": {"command": "pytest", "exit_code": 0, "passed": True, "duration_ms": 100},
             },
         ],
-        final_state_json={},
-        qa_json={},
-    )
-
-    assert "file_edit" in packet
-    assert "test.py" in packet
-    assert "test_run" in packet
-    assert "pytest" in packet
-
-
-def test_build_judge_packet_includes_test_results():
-    # Test that judge packet includes test results
-    from worker.tasks.judge import _build_judge_packet
-
-    packet = _build_judge_packet(
-        task_json={"bug_report": {"title": "Bug", "description": "Desc"}},
-        events_data=[],
-        final_state_json={},
+        final_state_json={
+            "commit_head": "abc123def456",
+            "pr": {
+                "title": "Fix the bug",
+                "description": "This PR fixes the issue by...",
+            },
+        },
         qa_json={
             "tests": {
                 "runner": "pytest",
@@ -354,28 +531,87 @@ def test_build_judge_packet_includes_test_results():
         },
     )
 
-    assert "Test Results" in packet
-    assert "pytest" in packet
-    assert "final_passed" in packet.lower() or "Final passed" in packet
-
 
-def test_build_judge_packet_includes_final_state():
-    # Test that judge packet includes final state details
+@pytest.mark.parametrize(
+    "needle",
+    [
+        # Bug report
+        "Test Bug",
+        "Bug description",
+        "Step 1",
+        "Expected behavior",
+        "Actual behavior",
+        # Event summaries
+        "file_edit",
+        "test.py",
+        "test_run",
+        "pytest",
+        # Test results
+        "Test Results",
+        "Final passed",
+        # Final state
+        "Final State",
+        "abc123def456",
+        "Fix the bug",
+    ],
+)
+def test_build_judge_packet_contains(judge_packet: str, needle: str):
+    assert needle in judge_packet
+
+
+def test_build_judge_packet_prefetches_previews(tmp_path):
+    from core.blob_store import LocalFsBlobStore
     from worker.tasks.judge import _build_judge_packet
 
-    packet = _build_judge_packet(
-        task_json={"bug_report": {"title": "Bug", "description": "Desc"}},
-        events_data=[],
-        final_state_json={
-            "commit_head": "abc123def456",
-            "pr": {
-                "title": "Fix the bug",
-                "description": "This PR fixes the issue by...",
-            },
+    blob_store = LocalFsBlobStore(root=tmp_path / "blobs")
+    thought_id = blob_store.put_bytes(b"Suspect the touch handler", "text/plain")
+    missing_id = "sha256:" + "0" * 64
+    events_data = [
+        {
+            "seq": 1, "ts_ms": 1, "type": "thought",
+            "payload_json": {"kind": "hypothesis", "content_blob_id": thought_id},
+        },
+        {
+            "seq": 2, "ts_ms": 2, "type": "thought",
+            "payload_json": {"kind": "plan", "content_blob_id": thought_id},
         },
-        qa_json={},
+        {
+            "seq": 3, "ts_ms": 3, "type": "terminal_output",
+            "payload_json": {"stream": "stdout", "chunk_blob_id": missing_id},
+        },
+    ]
+
+    with patch("worker.tasks.judge.blob_store", wraps=blob_store) as spy:
+        packet = _build_judge_packet(
+            task_json={}, events_data=events_data, final_state_json={}, qa_json={}
+        )
+
+    spy.get_many_bytes.assert_called_once()
+    spy.get_bytes.assert_not_called()
+    assert packet.count("Suspect the touch handler") == 2
+    assert "**terminal_output** (stdout): [truncated=False]" in packet
+
+
+def test_build_judge_packet_trims_events_to_context(monkeypatch):
+    from worker.tasks import judge
+
+    events_data = [
+        {
+            "seq": i, "ts_ms": i, "type": "commit",
+            "payload_json": {"commit_sha": "abc", "message": "m" * 100},
+        }
+        for i in range(1, 201)
+    ]
+    # Room for the fixed sections plus roughly 50 event lines
+    tokens = judge._SYSTEM_PROMPT_TOKENS + judge._MAX_COMPLETION_TOKENS + 3_500
+    monkeypatch.setattr(judge.settings, "JUDGE_CONTEXT_TOKENS", tokens)
+
+    packet = judge._build_judge_packet(
+        task_json={}, events_data=events_data, final_state_json={"commit_head": "h"}, qa_json={}
     )
 
-    assert "Final State" in packet
-    assert "abc123def456" in packet
-    assert "Fix the bug" in packet
+    assert "[seq=1, " in packet
+    assert "[seq=200, " not in packet
+    assert "later events omitted to fit the context window" in packet
+    assert packet.endswith("No test results recorded.")
+    assert len(packet) <= 3_500 * judge._CHARS_PER_TOKEN
@@ -2,8 +2,12 @@
 
 from __future__ import annotations
 
-import json
+import copy
+import re
 import uuid
+from collections.abc import Iterable
+from typing import Final
+from unittest.mock import patch
 
 import pytest
 from pydantic import ValidationError
@@ -35,6 +39,7 @@ from core.models import (
     JudgeOutput,
     JudgeResult,
     JudgeScores,
+    MAX_EVENTS_PER_BATCH,
     NavigationPayload,
     PRFinalState,
     PRMetadataPayload,
@@ -63,6 +68,7 @@ from core.validation import (
     validate_finalize,
     validate_trace_create,
 )
+from core import redaction
 from core.redaction import (
     apply_redaction,
     pii_mask,
@@ -75,42 +81,67 @@ from core.redaction import (
 # Fixtures / helpers
 # ---------------------------------------------------------------------------
 
-def _make_trace_create_dict() -> dict:
-    return {
-        "repo": {
-            "repo_id": "my-repo",
-            "commit_base": "abc123",
-        },
-        "task": {
-            "bug_report": {
-                "title": "Button is broken",
-                "description": "Clicking the button does nothing.",
-            },
-        },
-        "developer": {
-            "developer_id": "dev-1",
+_TRACE_CREATE_TEMPLATE: Final[dict] = {
+    "repo": {
+        "repo_id": "my-repo",
+        "commit_base": "abc123",
+    },
+    "task": {
+        "bug_report": {
+            "title": "Button is broken",
+            "description": "Clicking the button does nothing.",
         },
-        "environment": {
-            "ide": {"name": "vscode"},
-        },
-    }
+    },
+    "developer": {
+        "developer_id": "dev-1",
+    },
+    "environment": {
+        "ide": {"name": "vscode"},
+    },
+}
+
+# Valid v4-shaped id; nothing in this module depends on event_id uniqueness
+_FAKE_UUID: Final[str] = "00000000-0000-4000-8000-000000000000"
+
+# Nested values are shared between events; tests never mutate them in place
+_EVENT_TEMPLATE: Final[dict] = {
+    "event_id": _FAKE_UUID,
+    "ts_ms": 1700000000000,
+    "actor": {"kind": "human"},
+    "payload": {
+        "file_path": "src/main.py",
+        "edit_kind": "patch",
+        "patch_blob_id": "sha256:aabbccdd",
+    },
+}
+
+
+# Tests mutate nested keys of the result, so hand out a deep copy
+def _make_trace_create_dict() -> dict:
+    return copy.deepcopy(_TRACE_CREATE_TEMPLATE)
 
 
 def _make_event_dict(seq: int = 1, event_type: str = "file_edit", payload: dict | None = None) -> dict:
-    if payload is None:
-        payload = {
-            "file_path": "src/main.py",
-            "edit_kind": "patch",
-            "patch_blob_id": "sha256:aabbccdd",
-        }
-    return {
-        "event_id": str(uuid.uuid4()),
+    event = {
+        **_EVENT_TEMPLATE,
         "seq": seq,
-        "ts_ms": 1700000000000,
         "type": event_type,
-        "actor": {"kind": "human"},
-        "payload": payload,
     }
+    if payload is not None:
+        event["payload"] = payload
+    return event
+
+
+# Shallow-merged with per-event keys where only seq varies
+_EVENT_STUB: Final[dict] = _make_event_dict()
+
+# Validated once; tests that only vary seq copy these instead of re-validating
+_TC_TEMPLATE: Final[TraceCreate] = TraceCreate.model_validate(_make_trace_create_dict())
+_EVENT_BASE: Final[Event] = Event.model_validate(_make_event_dict())
+
+
+def _events_with_seqs(seqs: Iterable[int]) -> list[Event]:
+    return [_EVENT_BASE.model_copy(update={"seq": seq}) for seq in seqs]
 
 
 # ---------------------------------------------------------------------------
@@ -119,15 +150,13 @@ def _make_event_dict(seq: int = 1, event_type: str = "file_edit", payload: dict
 
 class TestTraceCreateRoundTrip:
     def test_minimal_trace_create(self):
-        data = _make_trace_create_dict()
-        tc = TraceCreate.model_validate(data)
+        tc = _TC_TEMPLATE
         assert tc.repo.repo_id == "my-repo"
         assert tc.developer.experience_level == ExperienceLevel.unknown
         assert tc.developer.consent_flags.store_raw_code is True
 
         # Round-trip
-        dumped = json.loads(tc.model_dump_json())
-        tc2 = TraceCreate.model_validate(dumped)
+        tc2 = TraceCreate.model_validate_json(tc.model_dump_json())
         assert tc2.repo.commit_base == tc.repo.commit_base
 
     def test_full_trace_create(self):
@@ -150,123 +179,81 @@ class TestTraceCreateRoundTrip:
         assert tc.environment.language == ["python", "typescript"]
 
 
-class TestEventRoundTrip:
-    def test_file_edit_event(self):
-        data = _make_event_dict()
-        event = Event.model_validate(data)
-        assert event.type == EventType.file_edit
+# (event_type, payload, expected payload class, attribute to check, expected value)
+_EVENT_CASES = [
+    ("file_edit", _EVENT_TEMPLATE["payload"], FileEditPayload, "file_path", "src/main.py"),
+    ("terminal_command", {
+        "cwd": "/home/user/repo",
+        "command": "pytest tests/",
+        "shell": "bash",
+    }, TerminalCommandPayload, "command", "pytest tests/"),
+    ("terminal_output", {
+        "stream": "stdout",
+        "chunk_blob_id": "sha256:1234",
+    }, TerminalOutputPayload, "is_truncated", False),
+    ("test_run", {
+        "command": "pytest",
+        "runner": "pytest",
+        "exit_code": 0,
+        "duration_ms": 5000,
+        "passed": True,
+    }, TestRunPayload, "passed", True),
+    ("thought", {
+        "content_blob_id": "sha256:abcd",
+        "kind": "hypothesis",
+        "links_to": [],
+    }, ThoughtPayload, "kind", ThoughtKind.hypothesis),
+    ("file_snapshot", {
+        "file_path": "src/main.py",
+        "content_blob_id": "sha256:1111",
+        "snapshot_reason": "pre_test",
+    }, FileSnapshotPayload, "snapshot_reason", SnapshotReason.pre_test),
+    ("commit", {
+        "commit_sha": "abc123",
+        "message": "fix: resolve button click handler",
+    }, CommitPayload, "commit_sha", "abc123"),
+    ("pr_metadata", {
+        "title": "Fix button",
+        "description": "Fixed the click handler",
+    }, PRMetadataPayload, "title", "Fix button"),
+    ("error", {
+        "error_type": "TypeError",
+        "message": "Cannot read property 'click' of undefined",
+    }, ErrorPayload, "error_type", "TypeError"),
+    ("navigation", {
+        "file_path": "src/main.py",
+        "symbol": "handle_click",
+        "line": 42,
+    }, NavigationPayload, "line", 42),
+]
 
-        payload = event.validated_payload()
-        assert isinstance(payload, FileEditPayload)
-        assert payload.file_path == "src/main.py"
 
-        # Round-trip
-        dumped = json.loads(event.model_dump_json())
-        event2 = Event.model_validate(dumped)
+class TestEventRoundTrip:
+    @pytest.mark.parametrize(
+        "event_type,payload,payload_cls,attr,expected",
+        _EVENT_CASES,
+        ids=[case[0] for case in _EVENT_CASES],
+    )
+    def test_event_payload(self, event_type, payload, payload_cls, attr, expected):
+        event = Event.model_validate(_make_event_dict(event_type=event_type, payload=payload))
+        assert event.type == EventType(event_type)
+
+        validated = event.validated_payload()
+        assert isinstance(validated, payload_cls)
+        assert getattr(validated, attr) == expected
+
+    def test_round_trip(self):
+        event = _EVENT_BASE
+        event2 = Event.model_validate_json(event.model_dump_json())
         assert event2.seq == event.seq
 
-    def test_terminal_command_event(self):
-        data = _make_event_dict(seq=2, event_type="terminal_command", payload={
-            "cwd": "/home/user/repo",
-            "command": "pytest tests/",
-            "shell": "bash",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, TerminalCommandPayload)
-        assert payload.command == "pytest tests/"
-
-    def test_terminal_output_event(self):
-        data = _make_event_dict(seq=3, event_type="terminal_output", payload={
-            "stream": "stdout",
-            "chunk_blob_id": "sha256:1234",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, TerminalOutputPayload)
-        assert payload.is_truncated is False
-
-    def test_test_run_event(self):
-        data = _make_event_dict(seq=4, event_type="test_run", payload={
-            "command": "pytest",
-            "runner": "pytest",
-            "exit_code": 0,
-            "duration_ms": 5000,
-            "passed": True,
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, TestRunPayload)
-        assert payload.passed is True
-
-    def test_thought_event(self):
-        data = _make_event_dict(seq=5, event_type="thought", payload={
-            "content_blob_id": "sha256:abcd",
-            "kind": "hypothesis",
-            "links_to": [],
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, ThoughtPayload)
-        assert payload.kind == ThoughtKind.hypothesis
-
-    def test_file_snapshot_event(self):
-        data = _make_event_dict(seq=6, event_type="file_snapshot", payload={
-            "file_path": "src/main.py",
-            "content_blob_id": "sha256:1111",
-            "snapshot_reason": "pre_test",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, FileSnapshotPayload)
-        assert payload.snapshot_reason == SnapshotReason.pre_test
-
-    def test_commit_event(self):
-        data = _make_event_dict(seq=7, event_type="commit", payload={
-            "commit_sha": "abc123",
-            "message": "fix: resolve button click handler",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, CommitPayload)
-
-    def test_pr_metadata_event(self):
-        data = _make_event_dict(seq=8, event_type="pr_metadata", payload={
-            "title": "Fix button",
-            "description": "Fixed the click handler",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, PRMetadataPayload)
-
-    def test_error_event(self):
-        data = _make_event_dict(seq=9, event_type="error", payload={
-            "error_type": "TypeError",
-            "message": "Cannot read property 'click' of undefined",
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, ErrorPayload)
-
-    def test_navigation_event(self):
-        data = _make_event_dict(seq=10, event_type="navigation", payload={
-            "file_path": "src/main.py",
-            "symbol": "handle_click",
-            "line": 42,
-        })
-        event = Event.model_validate(data)
-        payload = event.validated_payload()
-        assert isinstance(payload, NavigationPayload)
-
 
 class TestEventBatchRoundTrip:
     def test_batch_round_trip(self):
-        events = [_make_event_dict(seq=i) for i in range(1, 4)]
-        batch = EventBatch.model_validate({"events": events})
+        batch = EventBatch.model_validate({"events": _events_with_seqs(range(1, 4))})
         assert len(batch.events) == 3
 
-        dumped = json.loads(batch.model_dump_json())
-        batch2 = EventBatch.model_validate(dumped)
+        batch2 = EventBatch.model_validate_json(batch.model_dump_json())
         assert len(batch2.events) == 3
 
 
@@ -316,8 +303,7 @@ class TestTraceRoundTrip:
         assert trace.qa.judge.scores.minimality_of_fix == 5.0
 
         # Round-trip
-        dumped = json.loads(trace.model_dump_json())
-        trace2 = Trace.model_validate(dumped)
+        trace2 = Trace.model_validate_json(trace.model_dump_json())
         assert trace2.trace_id == trace.trace_id
 
 
@@ -412,6 +398,11 @@ class TestJudgeOutput:
 # Validation error cases
 # ---------------------------------------------------------------------------
 
+# Error field paths from a TraceValidationError's (cached) response body
+def _field_set(exc: TraceValidationError) -> frozenset[str]:
+    return frozenset(e["field"] for e in exc.response_body["errors"])
+
+
 class TestValidateTraceCreate:
     def test_valid(self):
         tc = validate_trace_create(_make_trace_create_dict())
@@ -422,16 +413,14 @@ class TestValidateTraceCreate:
         del data["repo"]
         with pytest.raises(TraceValidationError) as exc_info:
             validate_trace_create(data)
-        body = exc_info.value.to_response_body()
-        assert any("repo" in e["field"] for e in body["errors"])
+        assert any("repo" in f for f in _field_set(exc_info.value))
 
     def test_missing_bug_report_title(self):
         data = _make_trace_create_dict()
         del data["task"]["bug_report"]["title"]
         with pytest.raises(TraceValidationError) as exc_info:
             validate_trace_create(data)
-        body = exc_info.value.to_response_body()
-        assert any("title" in e["field"] for e in body["errors"])
+        assert any("title" in f for f in _field_set(exc_info.value))
 
     def test_invalid_experience_level(self):
         data = _make_trace_create_dict()
@@ -440,50 +429,59 @@ class TestValidateTraceCreate:
             validate_trace_create(data)
 
 
+# Over the 100-event cap; built once at import
+_TOO_MANY_EVENTS: Final[list[dict]] = [
+    _EVENT_STUB | {"seq": i} for i in range(1, MAX_EVENTS_PER_BATCH + 2)
+]
+
+# (request body, substring expected in an error field or None)
+_BAD_BATCHES = [
+    pytest.param({"events": []}, None, id="empty"),
+    pytest.param({"events": _TOO_MANY_EVENTS}, "events", id="too_many"),
+    pytest.param(
+        {"events": [_make_event_dict(event_type="unknown_type")]}, None, id="invalid_type"
+    ),
+    pytest.param({"events": [_make_event_dict(seq=0)]}, None, id="negative_seq"),
+    # file_edit missing edit_kind and patch_blob_id
+    pytest.param(
+        {"events": [_make_event_dict(payload={"file_path": "x.py"})]},
+        "payload",
+        id="missing_payload_field",
+    ),
+    # Terminal command with wrong payload shape
+    pytest.param(
+        {
+            "events": [
+                _make_event_dict(
+                    event_type="terminal_command", payload={"file_path": "wrong field"}
+                )
+            ]
+        },
+        "payload",
+        id="payload_wrong_shape",
+    ),
+]
+
+
 class TestValidateEventBatch:
     def test_valid_batch(self):
         data = {"events": [_make_event_dict(seq=1)]}
         batch = validate_event_batch(data)
         assert batch.events[0].type == EventType.file_edit
 
-    def test_empty_events(self):
-        with pytest.raises(TraceValidationError):
-            validate_event_batch({"events": []})
-
-    def test_too_many_events(self):
-        events = [_make_event_dict(seq=i) for i in range(1, 102)]
-        with pytest.raises(TraceValidationError):
-            validate_event_batch({"events": events})
-
-    def test_invalid_event_type(self):
-        data = {"events": [_make_event_dict(seq=1, event_type="unknown_type")]}
-        with pytest.raises(TraceValidationError):
-            validate_event_batch(data)
-
-    def test_missing_payload_field(self):
-        data = {"events": [_make_event_dict(seq=1, event_type="file_edit", payload={
-            "file_path": "x.py",
-            # missing edit_kind and patch_blob_id
-        })]}
+    @pytest.mark.parametrize("body,field_hint", _BAD_BATCHES)
+    def test_invalid_batch(self, body: dict, field_hint: str | None):
         with pytest.raises(TraceValidationError) as exc_info:
-            validate_event_batch(data)
-        body = exc_info.value.to_response_body()
-        assert any("payload" in e["field"] for e in body["errors"])
+            validate_event_batch(body)
+        # Only build the response body for cases that check error fields
+        if field_hint is not None:
+            assert any(field_hint in f for f in _field_set(exc_info.value))
 
-    def test_negative_seq(self):
-        data = {"events": [_make_event_dict(seq=0)]}
-        with pytest.raises(TraceValidationError):
-            validate_event_batch(data)
-
-    # Terminal command with wrong payload shape
-    def test_payload_validated_per_type(self):
-        data = {"events": [_make_event_dict(seq=1, event_type="terminal_command", payload={
-            "file_path": "wrong field",
-        })]}
-        with pytest.raises(TraceValidationError) as exc_info:
-            validate_event_batch(data)
-        body = exc_info.value.to_response_body()
-        assert any("payload" in e["field"] for e in body["errors"])
+    def test_too_many_events_short_circuits(self):
+        with patch("core.validation.EventBatch.model_validate") as model_validate:
+            with pytest.raises(TraceValidationError):
+                validate_event_batch({"events": _TOO_MANY_EVENTS})
+        model_validate.assert_not_called()
 
 
 class TestValidateFinalize:
@@ -500,25 +498,26 @@ class TestValidateFinalize:
             validate_finalize({})
 
 
+# Events with seq 1..7, built once so the tests below only time the monotonic check
+@pytest.fixture(scope="module")
+def seq_events() -> list[Event]:
+    return _events_with_seqs(range(1, 8))
+
+
 class TestSeqMonotonic:
-    def test_valid_sequence(self):
-        events = [Event.model_validate(_make_event_dict(seq=i)) for i in range(1, 4)]
-        validate_event_seq_monotonic(events)  # no error
-
-    def test_valid_sequence_with_offset(self):
-        events = [Event.model_validate(_make_event_dict(seq=i)) for i in range(5, 8)]
-        validate_event_seq_monotonic(events, current_high=4)
-
-    def test_non_monotonic(self):
-        events = [
-            Event.model_validate(_make_event_dict(seq=1)),
-            Event.model_validate(_make_event_dict(seq=1)),  # duplicate
-        ]
+    def test_valid_sequence(self, seq_events: list[Event]):
+        validate_event_seq_monotonic(seq_events[0:3])  # no error
+
+    def test_valid_sequence_with_offset(self, seq_events: list[Event]):
+        validate_event_seq_monotonic(seq_events[4:7], current_high=4)
+
+    def test_non_monotonic(self, seq_events: list[Event]):
+        events = [seq_events[0], seq_events[0]]  # duplicate seq=1
         with pytest.raises(TraceValidationError):
             validate_event_seq_monotonic(events)
 
-    def test_seq_not_greater_than_current_high(self):
-        events = [Event.model_validate(_make_event_dict(seq=3))]
+    def test_seq_not_greater_than_current_high(self, seq_events: list[Event]):
+        events = seq_events[2:3]  # seq=3
         with pytest.raises(TraceValidationError):
             validate_event_seq_monotonic(events, current_high=5)
 
@@ -527,6 +526,18 @@ class TestSeqMonotonic:
 # Redaction tests
 # ---------------------------------------------------------------------------
 
+# Constant redaction inputs, allocated once per module
+_NON_UTF8_256: Final[bytes] = bytes(range(256))
+_TWO_MB_XS: Final[bytes] = b"x" * 2_000_000
+
+
+class TestRedactionPatterns:
+    # Patterns must stay compiled at module scope, not per call
+    def test_patterns_are_precompiled(self):
+        assert all(isinstance(p, re.Pattern) for p in redaction._SECRET_PATTERNS)
+        assert all(isinstance(p, re.Pattern) for p, _ in redaction._PII_PATTERNS)
+
+
 class TestSecretScan:
     def test_detects_api_key(self):
         text = 'api_key = "sk-1234567890abcdef"'
@@ -596,13 +607,11 @@ class TestApplyRedaction:
         assert RedactionRule.pii_mask in result.rules_applied
 
     def test_binary_skips_text_rules(self):
-        data = bytes(range(256))  # non-UTF8
-        result = apply_redaction(data, rules=[RedactionRule.secret_scan])
+        result = apply_redaction(_NON_UTF8_256, rules=[RedactionRule.secret_scan])
         assert result.was_modified is False
 
     def test_truncation_rule(self):
-        data = b"x" * 2_000_000
-        result = apply_redaction(data, rules=[RedactionRule.truncate_large])
+        result = apply_redaction(_TWO_MB_XS, rules=[RedactionRule.truncate_large])
         assert result.was_truncated is True
         assert len(result.content) == 1_048_576
 
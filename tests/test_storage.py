@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
-from sqlalchemy import JSON, Integer, String, create_engine, event, text
+from sqlalchemy import create_engine, event, insert
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session
 
 from core.blob_store import LocalFsBlobStore
 from db.models import Base, BlobRow, EventRow, TraceRow
@@ -20,39 +22,52 @@ from db.models import Base, BlobRow, EventRow, TraceRow
 
 @pytest.fixture()
 def blob_store(tmp_path):
-    # Blob store rooted in a temp dir
+    # Blob store rooted in a fresh temp dir, for tests that inspect the layout
     return LocalFsBlobStore(root=tmp_path)
 
 
-@pytest.fixture()
-def db_session():
-    # Synchronous SQLite in-memory session for DB model tests
-    for table in Base.metadata.tables.values():
-        for col in table.columns:
-            col_type = type(col.type)
-            if col_type.__name__ == "JSONB":
-                col.type = JSON()
-            elif col_type.__name__ == "UUID":
-                col.type = String(36)
-            elif col_type.__name__ == "BigInteger" and col.primary_key:
-                col.type = Integer()
+@pytest.fixture(scope="module")
+def shared_blob_store(tmp_path_factory):
+    # Content-addressed writes never collide, so most tests can share one root
+    return LocalFsBlobStore(root=tmp_path_factory.mktemp("shared_blobs"))
+
 
+@pytest.fixture(scope="session")
+def db_engine():
+    # Synchronous SQLite in-memory engine, schema built once for the session
     engine = create_engine("sqlite:///:memory:")
 
-    # Enable FK enforcement in SQLite
     @event.listens_for(engine, "connect")
-    def _set_sqlite_pragma(dbapi_conn, _connection_record):
+    def _on_connect(dbapi_conn, _connection_record):
+        # Let SQLAlchemy emit BEGIN itself so SAVEPOINTs behave under pysqlite
+        dbapi_conn.isolation_level = None
+        # Enable FK enforcement in SQLite
         cursor = dbapi_conn.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
         cursor.close()
 
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
     Base.metadata.create_all(engine)
-    factory = sessionmaker(bind=engine)
-    session = factory()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def db_session(db_engine):
+    # Each test runs inside an outer transaction that is rolled back afterwards;
+    # session.commit() only releases a SAVEPOINT within it
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
     try:
         yield session
     finally:
         session.close()
+        transaction.rollback()
+        connection.close()
 
 
 # ---------------------------------------------------------------------------
@@ -61,52 +76,97 @@ def db_session():
 
 
 class TestLocalFsBlobStore:
-    def test_put_get_roundtrip(self, blob_store: LocalFsBlobStore):
+    def test_put_get_roundtrip(self, shared_blob_store: LocalFsBlobStore):
         data = b"hello world"
-        blob_id = blob_store.put_bytes(data, "text/plain")
+        blob_id = shared_blob_store.put_bytes(data, "text/plain")
 
         assert blob_id.startswith("sha256:")
-        assert blob_store.get_bytes(blob_id) == data
+        assert shared_blob_store.get_bytes(blob_id) == data
 
-    def test_dedup_same_content(self, blob_store: LocalFsBlobStore):
+    def test_dedup_same_content(self, shared_blob_store: LocalFsBlobStore):
         data = b"duplicate content"
-        id1 = blob_store.put_bytes(data, "text/plain")
-        id2 = blob_store.put_bytes(data, "application/octet-stream")
+        id1 = shared_blob_store.put_bytes(data, "text/plain")
+        id2 = shared_blob_store.put_bytes(data, "application/octet-stream")
         assert id1 == id2
 
-    def test_different_content_different_ids(self, blob_store: LocalFsBlobStore):
-        id1 = blob_store.put_bytes(b"aaa", "text/plain")
-        id2 = blob_store.put_bytes(b"bbb", "text/plain")
+    def test_different_content_different_ids(self, shared_blob_store: LocalFsBlobStore):
+        id1 = shared_blob_store.put_bytes(b"aaa", "text/plain")
+        id2 = shared_blob_store.put_bytes(b"bbb", "text/plain")
         assert id1 != id2
 
-    def test_get_uri(self, blob_store: LocalFsBlobStore):
-        blob_id = blob_store.put_bytes(b"uri test", "text/plain")
-        uri = blob_store.get_uri(blob_id)
+    def test_get_uri(self, shared_blob_store: LocalFsBlobStore):
+        blob_id = shared_blob_store.put_bytes(b"uri test", "text/plain")
+        uri = shared_blob_store.get_uri(blob_id)
         assert uri.startswith("file://")
         assert "sha256" in uri
 
-    def test_exists_true(self, blob_store: LocalFsBlobStore):
-        blob_id = blob_store.put_bytes(b"exists", "text/plain")
-        assert blob_store.exists(blob_id) is True
+    def test_exists_true(self, shared_blob_store: LocalFsBlobStore):
+        blob_id = shared_blob_store.put_bytes(b"exists", "text/plain")
+        assert shared_blob_store.exists(blob_id) is True
 
-    def test_exists_false(self, blob_store: LocalFsBlobStore):
-        assert blob_store.exists("sha256:0000000000000000000000000000000000000000000000000000000000000000") is False
+    def test_exists_false(self, shared_blob_store: LocalFsBlobStore):
+        assert shared_blob_store.exists("sha256:" + "0" * 64) is False
 
-    def test_get_missing_raises(self, blob_store: LocalFsBlobStore):
+    def test_get_missing_raises(self, shared_blob_store: LocalFsBlobStore):
         with pytest.raises(FileNotFoundError):
-            blob_store.get_bytes("sha256:0000000000000000000000000000000000000000000000000000000000000000")
+            shared_blob_store.get_bytes("sha256:0000000000000000000000000000000000000000000000000000000000000000")
+
+    def test_get_many_skips_missing(self, shared_blob_store: LocalFsBlobStore):
+        present = shared_blob_store.put_bytes(b"many", "text/plain")
+        missing = "sha256:" + "f" * 64
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            found = shared_blob_store.get_many_bytes(
+                [present, missing, "bogus", present], executor=pool
+            )
+        assert found == {present: b"many"}
+        assert shared_blob_store.get_many_bytes([present], max_bytes=2) == {present: b"ma"}
 
     def test_storage_layout(self, blob_store: LocalFsBlobStore, tmp_path):
-        # Verify files land in {root}/sha256/{first2}/{fullhash}
-        import hashlib
-
-        data = b"layout check"
-        hex_hash = hashlib.sha256(data).hexdigest()
-        blob_store.put_bytes(data, "text/plain")
+        # Verify files land in {root}/sha256/{first2}/{fullhash}, using the store's own hash
+        blob_id = blob_store.put_bytes(b"layout check", "text/plain")
+        hex_hash = blob_id.removeprefix("sha256:")
 
         expected = tmp_path / "sha256" / hex_hash[:2] / hex_hash
         assert expected.exists()
 
+    def test_open_write_matches_put_bytes(self, blob_store: LocalFsBlobStore, tmp_path):
+        with blob_store.open_write() as writer:
+            writer.write(b"streamed ")
+            writer.write(b"content")
+        assert writer.size == len(b"streamed content")
+        assert writer.blob_id == blob_store.put_bytes(b"streamed content", "text/plain")
+        assert blob_store.get_bytes(writer.blob_id) == b"streamed content"
+        # The temp file was moved into place, not left behind
+        assert not any((tmp_path / "tmp").iterdir())
+
+    def test_open_write_blob_mode_matches_put_bytes(self, blob_store: LocalFsBlobStore):
+        with blob_store.open_write() as writer:
+            writer.write(b"streamed mode")
+        put_id = blob_store.put_bytes(b"put mode", "text/plain")
+
+        def mode(blob_id: str) -> int:
+            return os.stat(blob_store.get_uri(blob_id).removeprefix("file://")).st_mode & 0o777
+
+        assert mode(writer.blob_id) == mode(put_id)
+
+    def test_open_write_aborts_on_error(self, blob_store: LocalFsBlobStore, tmp_path):
+        with pytest.raises(RuntimeError):
+            with blob_store.open_write() as writer:
+                writer.write(b"partial")
+                raise RuntimeError("boom")
+        assert writer.blob_id is None
+        assert not any((tmp_path / "tmp").iterdir())
+
+    def test_open_write_abort_inside_block_stores_nothing(
+        self, blob_store: LocalFsBlobStore, tmp_path
+    ):
+        with blob_store.open_write() as writer:
+            writer.abort()
+        assert writer.blob_id is None
+        assert not any((tmp_path / "tmp").iterdir())
+        with pytest.raises(ValueError, match="aborted"):
+            writer.close()
+
 
 # ---------------------------------------------------------------------------
 # DB model tests
@@ -135,6 +195,12 @@ class TestTraceRow:
         assert fetched.finalized_at_ms is None
 
 
+# Core executemany insert; skips ORM unit-of-work bookkeeping per row
+def _bulk_insert_events(session: Session, rows: list[dict]) -> None:
+    session.execute(insert(EventRow), rows)
+    session.commit()
+
+
 class TestEventRow:
     def _make_trace(self, db_session: Session) -> str:
         trace_id = str(uuid.uuid4())
@@ -166,7 +232,7 @@ class TestEventRow:
         db_session.add(row)
         db_session.commit()
 
-        result = db_session.query(EventRow).filter_by(event_id=event_id).one()
+        result = db_session.get(EventRow, row.id)
         assert result.seq == 1
         assert result.type == "file_edit"
 
@@ -182,12 +248,8 @@ class TestEventRow:
             actor_json={"kind": "human"},
             payload_json={},
         )
-        db_session.add(EventRow(**base))
-        db_session.commit()
-
-        db_session.add(EventRow(**{**base, "seq": 2}))
         with pytest.raises(IntegrityError):
-            db_session.commit()
+            _bulk_insert_events(db_session, [base, {**base, "seq": 2}])
 
 
 class TestBlobRow:
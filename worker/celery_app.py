@@ -1,8 +1,18 @@
 """QA worker entrypoint for Celery"""
 
+import logging
 import os
+import time
+from collections.abc import Collection
+from typing import Any
 
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from celery.worker.request import Request
+from celery_batches import Batches, SimpleRequest
+from celery_batches.trace import apply_batches_task
+
+logger = logging.getLogger(__name__)
 
 redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
 
@@ -19,8 +29,145 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    # Nothing reads task results (trace status lives in the DB), so skip the Redis
+    # write per task; a task that needs its result can set ignore_result=False
+    task_ignore_result=True,
+    result_expires=3600,
     task_acks_late=True,
     worker_prefetch_multiplier=1,
+    # Keep broker/backend connections pooled and alive instead of re-handshaking
+    # with Redis on every send_task
+    broker_pool_limit=32,
+    broker_connection_retry_on_startup=True,
+    broker_transport_options={"socket_keepalive": True, "health_check_interval": 30},
+    result_backend_transport_options={"socket_keepalive": True},
+    # run_judge and finalize_qa are celery-batches tasks; the worker on their queue
+    # runs with --prefetch-multiplier=0 so batches can fill (see docker-compose.yml)
+    task_routes={
+        "qa.run_judge": {"queue": "qa.batched"},
+        "qa.finalize_qa": {"queue": "qa.batched"},
+    },
 )
 
 celery_app.autodiscover_tasks(["worker.tasks"])
+
+
+# Online batch sizing in the style of joblib's auto-batching: keep a moving
+# average of batch wall time and double the size while batches are fast,
+# halve it when they are slow
+class _BatchSizer:
+    MIN_SIZE = 1
+    MAX_SIZE = 1024
+    FAST_SECONDS = 0.5
+    SLOW_SECONDS = 2.0
+    # Weight of the newest sample in the moving average
+    SMOOTHING = 0.5
+
+    def __init__(self, initial: int) -> None:
+        self.size = min(max(initial, self.MIN_SIZE), self.MAX_SIZE)
+        self.avg_seconds: float | None = None
+
+    # count is the number of requests in the batch; sizers that target time per
+    # request rather than per batch use it
+    def record(self, seconds: float, count: int = 1) -> None:
+        if self.avg_seconds is None:
+            self.avg_seconds = seconds
+        else:
+            self.avg_seconds = self.SMOOTHING * seconds + (1 - self.SMOOTHING) * self.avg_seconds
+
+    # Called once per completed batch; returns the size for the next one
+    def suggest(self) -> int:
+        if self.avg_seconds is not None:
+            if self.avg_seconds < self.FAST_SECONDS:
+                self.size = min(self.size * 2, self.MAX_SIZE)
+            elif self.avg_seconds > self.SLOW_SECONDS:
+                self.size = max(self.size // 2, self.MIN_SIZE)
+        return self.size
+
+
+# Batches base whose flush_every follows a _BatchSizer (sizer_class, overridable
+# per task). Timing happens in the consumer process (flush and its return
+# callback both run there), so the new size takes effect for the next buffer
+# regardless of the pool type.
+# flush mirrors Batches.flush from celery-batches 0.11 (pinned in pyproject.toml)
+# with timing added to its return callback: the pools return different result
+# types (None for solo), so there is no portable hook on super().flush()'s result
+class AdaptiveBatches(Batches):
+    abstract = True
+    flush_every: int
+    sizer_class: type[_BatchSizer] = _BatchSizer
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._sizer = self.sizer_class(self.flush_every)
+
+    def flush(self, requests: Collection[Request]) -> Any:
+        requests = list(requests)
+        started = time.monotonic()
+        serializable_requests = ([SimpleRequest.from_request(r) for r in requests],)
+
+        def on_accepted(pid: int, time_accepted: float) -> None:
+            for req in requests:
+                if not req.task.acks_late:
+                    req.acknowledge()
+
+        def on_return(result: Any) -> None:
+            for req in requests:
+                if req.task.acks_late:
+                    req.acknowledge()
+            elapsed = time.monotonic() - started
+            self._sizer.record(elapsed, len(requests))
+            self.flush_every = self._sizer.suggest()
+            logger.debug(
+                "%s batch of %d took %.3fs (avg %.3fs); next flush_every=%d",
+                self.name, len(requests), elapsed, self._sizer.avg_seconds, self.flush_every,
+            )
+
+        return self._pool.apply_async(
+            apply_batches_task,
+            (self, serializable_requests, 0, None),
+            accept_callback=on_accepted,
+            callback=on_return,
+        )
+
+
+# Build the Docker client once per worker process rather than on the first task
+@worker_process_init.connect
+def _init_docker_client(**_kwargs) -> None:
+    from worker.tasks.test_runner import _get_docker
+
+    try:
+        _get_docker()
+    except Exception:
+        # The first run_tests call retries and records the failure on its trace
+        logger.warning("Docker client unavailable at worker start", exc_info=True)
+
+
+@worker_process_init.connect
+def _init_openai_client(**_kwargs) -> None:
+    from worker.tasks.judge import _get_openai
+
+    try:
+        _get_openai()
+    except Exception:
+        # The first run_judge call builds it again and reports the error per trace
+        logger.warning("OpenAI client unavailable at worker start", exc_info=True)
+
+
+# Dispatch many (task name, args) pairs over one pooled producer instead of
+# acquiring a broker connection per send_task call. run_judge chains its
+# batch's finalize_qa tasks through this
+def send_tasks_bulk(specs: list[tuple[str, list]]) -> None:
+    if not specs:
+        return
+    with celery_app.producer_or_acquire() as producer:
+        for name, args in specs:
+            celery_app.send_task(name, args=args, producer=producer)
+
+
+# Let queued background I/O (container removal) finish before the process exits
+@worker_process_shutdown.connect
+def _shutdown_io_pool(**_kwargs) -> None:
+    from worker.tasks.test_runner import _io_pool
+
+    _io_pool.shutdown(wait=True)
@@ -4,36 +4,146 @@ from __future__ import annotations
 
 import logging
 
-from core.models import QA
+from celery_batches import SimpleRequest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
 from db.models import TraceRow
 from db.session import get_sync_session
-from worker.celery_app import celery_app
+from worker.celery_app import AdaptiveBatches, celery_app
 
 logger = logging.getLogger(__name__)
 
+# ->> text of an empty qa_json section, which finalize treats as missing
+_EMPTY_SECTION = "{}"
+
 
-@celery_app.task(name="qa.finalize_qa", bind=True, max_retries=0)
-def finalize_qa(self, trace_id: str) -> dict:
-    return _finalize_qa_impl(trace_id)
+# Buffered by celery-batches: one call handles up to flush_every finalize requests
+# in a single session, with flush_every retuned from batch timings (starting at 64).
+# Runs on the qa.batched queue so the worker consuming it can use an unbounded
+# prefetch without hoarding run_tests jobs (see celery_app.py)
+@celery_app.task(name="qa.finalize_qa", base=AdaptiveBatches, flush_every=64, flush_interval=1.0)
+def finalize_qa(requests: list[SimpleRequest]) -> None:
+    outcomes = _finalize_qa_batch([req.args[0] for req in requests])
+    # Results are ignored app-wide, so per-trace failures are only logged
+    for trace_id, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            logger.error("finalize_qa failed for trace %s: %s", trace_id, outcome)
 
 
 def _finalize_qa_impl(trace_id: str) -> dict:
+    outcome = _finalize_qa_batch([trace_id])[trace_id]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+# Mark every ready trace complete in one transaction; traces that are not ready
+# map to the ValueError explaining why
+def _finalize_qa_batch(trace_ids: list[str]) -> dict[str, dict | ValueError]:
+    outcomes: dict[str, dict | ValueError] = {}
     with get_sync_session() as session:
-        row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-        if row is None:
-            raise ValueError(f"Trace not found: {trace_id}")
+        if session.get_bind().dialect.name == "postgresql":
+            done = _finalize_conditional_update(session, trace_ids)
+            # Re-read the rest only to report why the update skipped them
+            pending = [tid for tid in trace_ids if tid not in done]
+            for tid in _collect_ready(session, pending, outcomes):
+                outcomes[tid] = ValueError(f"Trace {tid} QA data incomplete")
+        else:
+            done = _collect_ready(session, trace_ids, outcomes)
+            if done:
+                session.execute(
+                    update(TraceRow)
+                    .where(TraceRow.trace_id.in_(done))
+                    .values(status="complete")
+                )
+        if logger.isEnabledFor(logging.DEBUG):
+            _log_invalid_qa(session, done)
+
+    for tid in done:
+        logger.info("Trace %s QA finalized — status set to complete", tid)
+        outcomes[tid] = {"trace_id": tid, "status": "complete"}
+    return outcomes
+
+
+# Happy path in one statement: ->> yields SQL NULL for both a missing key and a JSON
+# null, and NULL <> '{}' is not true, so one comparison rejects all three the way
+# _section_missing does
+def _finalize_conditional_update(session: Session, trace_ids: list[str]) -> list[str]:
+    result = session.execute(
+        update(TraceRow)
+        .where(
+            TraceRow.trace_id.in_(trace_ids),
+            TraceRow.qa_json["tests"].as_string() != _EMPTY_SECTION,
+            TraceRow.qa_json["judge"].as_string() != _EMPTY_SECTION,
+        )
+        .values(status="complete")
+        .returning(TraceRow.trace_id)
+    )
+    completed = {str(tid) for tid in result.scalars()}
+    return [tid for tid in trace_ids if tid in completed]
+
+
+# Load qa_json alone (the other JSON columns are never read here) and return the
+# traces whose tests and judge sections both exist; the rest get an error outcome
+def _collect_ready(
+    session: Session, trace_ids: list[str], outcomes: dict[str, dict | ValueError]
+) -> list[str]:
+    if not trace_ids:
+        return []
+    found = {
+        str(tid): qa
+        for tid, qa in session.execute(
+            select(TraceRow.trace_id, TraceRow.qa_json).where(TraceRow.trace_id.in_(trace_ids))
+        )
+    }
+
+    ready: list[str] = []
+    for tid in trace_ids:
+        try:
+            _check_qa(tid, found)
+        except ValueError as exc:
+            outcomes[tid] = exc
+        else:
+            ready.append(tid)
+    return ready
+
+
+def _check_qa(trace_id: str, found: dict[str, dict | None]) -> None:
+    if trace_id not in found:
+        raise ValueError(f"Trace not found: {trace_id}")
+
+    qa = found[trace_id]
+    if not qa:
+        raise ValueError(f"Trace {trace_id} has no QA data")
+
+    # Only presence matters here; the test runner and judge validated their sections on write
+    if _section_missing(qa.get("tests")):
+        raise ValueError(f"Trace {trace_id} missing qa.tests")
+    if _section_missing(qa.get("judge")):
+        raise ValueError(f"Trace {trace_id} missing qa.judge")
+
 
-        if not row.qa_json:
-            raise ValueError(f"Trace {trace_id} has no QA data")
+# Python twin of the SQL check in _finalize_conditional_update: absent, null and {}
+# all count as missing
+def _section_missing(section: object) -> bool:
+    return section is None or section == {}
 
-        qa = QA.model_validate(row.qa_json)
 
-        if qa.tests is None:
-            raise ValueError(f"Trace {trace_id} missing qa.tests")
-        if qa.judge is None:
-            raise ValueError(f"Trace {trace_id} missing qa.judge")
+# Debug-only diagnostic: full QA validation of the traces just completed. Never
+# changes an outcome, so the finalize path is the same with or without it
+def _log_invalid_qa(session: Session, trace_ids: list[str]) -> None:
+    if not trace_ids:
+        return
+    from pydantic import ValidationError
 
-        row.status = "complete"
+    from core.models import QA
 
-    logger.info("Trace %s QA finalized — status set to complete", trace_id)
-    return {"trace_id": trace_id, "status": "complete"}
+    rows = session.execute(
+        select(TraceRow.trace_id, TraceRow.qa_json).where(TraceRow.trace_id.in_(trace_ids))
+    )
+    for tid, qa in rows:
+        try:
+            QA.model_validate(qa)
+        except ValidationError as exc:
+            logger.debug("Trace %s finalized with qa_json failing QA validation: %s", tid, exc)
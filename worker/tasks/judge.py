@@ -2,12 +2,25 @@
 
 from __future__ import annotations
 
-import json
+import hashlib
+import io
 import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any
 
 import openai
+import orjson
+from celery_batches import SimpleRequest
+from openai.types.shared_params import ResponseFormatJSONSchema
 from pydantic import ValidationError
+from sqlalchemy import select
 
 from core.blob_store import LocalFsBlobStore
 from core.config import settings
@@ -16,15 +29,33 @@ from core.models import (
     JudgeOutput,
     JudgeResult,
     JudgeScores,
-    QA,
 )
 from db.models import EventRow, TraceRow
+from db.qa_json import merge_qa_json
 from db.session import get_sync_session
-from worker.celery_app import celery_app
+from worker.celery_app import AdaptiveBatches, _BatchSizer, celery_app, send_tasks_bulk
 
 logger = logging.getLogger(__name__)
 blob_store = LocalFsBlobStore()
 
+# One OpenAI client per worker process so keep-alive connections and TLS sessions
+# carry across judge calls; built post-fork by worker_process_init (see celery_app.py)
+_openai_client: openai.OpenAI | None = None
+_openai_client_lock = threading.Lock()
+
+# Shared by every packet build in the process, so concurrent judge calls in a
+# batch cannot multiply the number of outstanding blob reads
+_blob_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="judge-blob")
+
+# Event types whose summary includes a blob preview, and the payload key holding it
+_PREVIEW_BLOB_KEYS = {"thought": "content_blob_id", "terminal_output": "chunk_blob_id"}
+
+# Previews show at most this many characters, so only a prefix of each blob is
+# read: UTF-8 takes at most 4 bytes per character, so this many bytes always
+# decodes to more than the longest preview and "..." is still appended correctly
+_PREVIEW_MAX_CHARS = 500
+_PREVIEW_READ_BYTES = 4 * _PREVIEW_MAX_CHARS + 4
+
 RUBRIC_TEXT = """# LLM Judge Rubric
 
 ## Scoring Dimensions
@@ -126,58 +157,197 @@ IMPORTANT:
 - The overall score should be the average of all 6 dimension scores, rounded to 1 decimal place.
 - Only set flags when clearly warranted based on the evidence."""
 
+RUBRIC_VERSION = "1.0"
+
+# Shared by every judge call so requests land on the same prompt-cache shard
+_PROMPT_CACHE_KEY = "datacurve-judge-rubric-v1"
+
+_MAX_COMPLETION_TOKENS = 8000
+
+# Rough chars-per-token for English and code: enough for a budget check without
+# pulling in a tokenizer. The static prompt's share is estimated once, at import
+_CHARS_PER_TOKEN = 4
+_SYSTEM_PROMPT_TOKENS = -(-len(SYSTEM_PROMPT) // _CHARS_PER_TOKEN)
+
+
+# Every judge call is an LLM round-trip of seconds, so a whole batch always looks
+# "slow" to the default sizer. Size on time per trace instead, and never below
+# the number of calls a batch runs side by side
+class _JudgeBatchSizer(_BatchSizer):
+    MIN_SIZE = settings.JUDGE_BATCH_CONCURRENCY
+    MAX_SIZE = max(64, settings.JUDGE_BATCH_CONCURRENCY)
+    FAST_SECONDS = 1.0
+    SLOW_SECONDS = 10.0
+
+    def record(self, seconds: float, count: int = 1) -> None:
+        super().record(seconds / max(count, 1))
+
 
-@celery_app.task(name="qa.run_judge", bind=True, max_retries=0)
-def run_judge(self, trace_id: str) -> dict:
+# Buffered by celery-batches like finalize_qa: each flush judges its traces with
+# up to JUDGE_BATCH_CONCURRENCY LLM calls in flight, sharing one DB load and one
+# write transaction
+@celery_app.task(
+    name="qa.run_judge",
+    base=AdaptiveBatches,
+    sizer_class=_JudgeBatchSizer,
+    flush_every=16,
+    flush_interval=2.0,
+)
+def run_judge(requests: list[SimpleRequest]) -> None:
+    trace_ids = [req.args[0] for req in requests]
     try:
-        return _run_judge_impl(trace_id)
+        outcomes = _run_judge_batch(trace_ids)
     except Exception as exc:
-        logger.exception("run_judge failed for trace %s", trace_id)
-        _mark_failed(trace_id, str(exc))
-        raise
+        logger.exception("run_judge batch failed for traces %s", trace_ids)
+        outcomes = dict.fromkeys(trace_ids, exc)
+
+    for trace_id, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            logger.error("run_judge failed for trace %s: %s", trace_id, outcome)
+            # A malformed id names no row, and binding it would only fail again
+            if _is_trace_id(trace_id):
+                _mark_failed(trace_id, str(outcome))
 
 
 def _run_judge_impl(trace_id: str) -> dict:
-    # Load trace and events
+    outcome = _run_judge_batch([trace_id])[trace_id]
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
+
+
+# Judge every trace in the batch; traces that fail map to their exception
+def _run_judge_batch(trace_ids: list[str]) -> dict[str, dict | Exception]:
+    trace_ids = list(dict.fromkeys(trace_ids))
+    outcomes: dict[str, dict | Exception] = {}
+
+    # One malformed id in the shared IN (...) load would fail the whole batch on
+    # Postgres, so reject those requests alone up front
+    valid_ids: list[str] = []
+    for trace_id in trace_ids:
+        if _is_trace_id(trace_id):
+            valid_ids.append(trace_id)
+        else:
+            outcomes[trace_id] = ValueError(f"Invalid trace id: {trace_id}")
+
+    inputs = _load_judge_inputs(valid_ids) if valid_ids else {}
+    for trace_id in valid_ids:
+        if trace_id not in inputs:
+            outcomes[trace_id] = ValueError(f"Trace not found: {trace_id}")
+
+    # LLM calls dominate and are independent, so run them side by side
+    results: dict[str, JudgeResult] = {}
+    pending = [trace_id for trace_id in trace_ids if trace_id in inputs]
+    if pending:
+        workers = min(settings.JUDGE_BATCH_CONCURRENCY, len(pending))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                trace_id: pool.submit(_judge_trace, **inputs[trace_id]) for trace_id in pending
+            }
+            for trace_id, future in futures.items():
+                try:
+                    results[trace_id] = future.result()
+                except Exception as exc:
+                    outcomes[trace_id] = exc
+
+    if not results:
+        return outcomes
+
+    # Update every judged trace's qa_json in one transaction
     with get_sync_session() as session:
-        row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-        if row is None:
-            raise ValueError(f"Trace not found: {trace_id}")
-
-        # Read trace data while in session
-        task_json = row.task_json or {}
-        final_state_json = row.final_state_json or {}
-        qa_json_data = row.qa_json or {}
-
-        # Query events ordered by seq
-        events = (
-            session.query(EventRow)
-            .filter_by(trace_id=trace_id)
-            .order_by(EventRow.seq)
-            .all()
+        missing = merge_qa_json(
+            session,
+            {trace_id: {"judge": result.model_dump()} for trace_id, result in results.items()},
         )
+    # Traces deleted while they were being judged get no finalize_qa
+    for trace_id in missing:
+        del results[trace_id]
+        outcomes[trace_id] = ValueError(f"Trace not found: {trace_id}")
+    if not results:
+        return outcomes
+
+    # Chain to finalize_qa for the whole batch over one producer
+    send_tasks_bulk([("qa.finalize_qa", [trace_id]) for trace_id in results])
+    for trace_id, judge_result in results.items():
+        outcomes[trace_id] = {
+            "trace_id": trace_id,
+            "overall": judge_result.overall,
+            "flags": [f.value for f in judge_result.flags],
+        }
+    return outcomes
+
+
+def _is_trace_id(value: object) -> bool:
+    try:
+        uuid.UUID(str(value))
+    except ValueError:
+        return False
+    return True
 
-        # Extract event data while in session
-        events_data = [
-            {
-                "seq": e.seq,
-                "ts_ms": e.ts_ms,
-                "type": e.type,
-                "payload_json": e.payload_json,
+
+# Load the packet inputs for all traces: one Core select for traces, one for their
+# events, both as plain tuples so no ORM rows are hydrated
+def _load_judge_inputs(trace_ids: list[str]) -> dict[str, dict[str, Any]]:
+    with get_sync_session() as session:
+        trace_rows = session.execute(
+            select(
+                TraceRow.trace_id,
+                TraceRow.task_json,
+                TraceRow.final_state_json,
+                TraceRow.qa_json,
+            ).where(TraceRow.trace_id.in_(trace_ids))
+        )
+        inputs: dict[str, dict[str, Any]] = {
+            str(tid): {
+                "task_json": task_json or {},
+                "final_state_json": final_state_json or {},
+                "qa_json": qa_json or {},
+                "events_data": [],
             }
-            for e in events
-        ]
+            for tid, task_json, final_state_json, qa_json in trace_rows
+        }
+        if not inputs:
+            return inputs
+
+        # Events ordered by seq within each trace
+        event_rows = session.execute(
+            select(
+                EventRow.trace_id,
+                EventRow.seq,
+                EventRow.ts_ms,
+                EventRow.type,
+                EventRow.payload_json,
+            )
+            .where(EventRow.trace_id.in_(list(inputs)))
+            .order_by(EventRow.trace_id, EventRow.seq)
+        )
+        for tid, seq, ts_ms, event_type, payload_json in event_rows:
+            inputs[str(tid)]["events_data"].append({
+                "seq": seq,
+                "ts_ms": ts_ms,
+                "type": event_type,
+                "payload_json": payload_json,
+            })
+
+    return inputs
 
+
+def _judge_trace(
+    task_json: dict,
+    events_data: list[dict],
+    final_state_json: dict,
+    qa_json: dict,
+) -> JudgeResult:
     # Build judge packet
     judge_packet = _build_judge_packet(
         task_json=task_json,
         events_data=events_data,
         final_state_json=final_state_json,
-        qa_json=qa_json_data,
+        qa_json=qa_json,
     )
 
-    # Call LLM
-    judge_output = _call_llm_judge(judge_packet)
+    # Call LLM (or replay a cached verdict for an identical packet)
+    judge_output = _call_llm_judge_cached(judge_packet)
 
     # Store rationale as blob
     rationale_blob_id = blob_store.put_bytes(
@@ -185,35 +355,15 @@ def _run_judge_impl(trace_id: str) -> dict:
         "text/plain",
     )
 
-    # Build JudgeResult
-    judge_result = JudgeResult(
+    return JudgeResult(
         model=settings.JUDGE_MODEL,
-        rubric_version="1.0",
+        rubric_version=RUBRIC_VERSION,
         scores=judge_output.scores,
         overall=judge_output.overall,
         rationale_blob_id=rationale_blob_id,
         flags=judge_output.flags,
     )
 
-    # Update trace qa_json
-    with get_sync_session() as session:
-        row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-        if row is None:
-            raise ValueError(f"Trace not found: {trace_id}")
-
-        existing_qa = QA.model_validate(row.qa_json) if row.qa_json else QA()
-        existing_qa.judge = judge_result
-        row.qa_json = existing_qa.model_dump()
-
-    # Chain to finalize_qa task
-    celery_app.send_task("qa.finalize_qa", args=[trace_id])
-
-    return {
-        "trace_id": trace_id,
-        "overall": judge_result.overall,
-        "flags": [f.value for f in judge_result.flags],
-    }
-
 
 def _build_judge_packet(
     task_json: dict,
@@ -221,146 +371,270 @@ def _build_judge_packet(
     final_state_json: dict,
     qa_json: dict,
 ) -> str:
-    sections: list[str] = []
+    buf = io.StringIO()
+    w = buf.write
 
     # 1. Bug report summary
     bug_report = task_json.get("bug_report", {})
-    sections.append("## Bug Report")
-    sections.append(f"**Title:** {bug_report.get('title', 'N/A')}")
-    sections.append(f"**Description:** {bug_report.get('description', 'N/A')}")
+    w("## Bug Report\n")
+    w(f"**Title:** {bug_report.get('title', 'N/A')}\n")
+    w(f"**Description:** {bug_report.get('description', 'N/A')}\n")
     if bug_report.get("repro_steps"):
-        sections.append(f"**Repro Steps:** {bug_report['repro_steps']}")
+        w(f"**Repro Steps:** {bug_report['repro_steps']}\n")
     if bug_report.get("expected"):
-        sections.append(f"**Expected:** {bug_report['expected']}")
+        w(f"**Expected:** {bug_report['expected']}\n")
     if bug_report.get("actual"):
-        sections.append(f"**Actual:** {bug_report['actual']}")
-    sections.append("")
+        w(f"**Actual:** {bug_report['actual']}\n")
+    w("\n")
 
-    # 2. Key events from trace
-    sections.append("## Developer Actions (ordered by sequence)")
-    for event in events_data:
-        event_summary = _summarize_event(event)
-        if event_summary:
-            sections.append(event_summary)
-    sections.append("")
+    # Sections 3 and 4 are rendered ahead of the events so that the event list can
+    # be cut to whatever context window is left once they are counted
+    tail = io.StringIO()
+    t = tail.write
 
     # 3. Final diff summary
-    sections.append("## Final State")
+    t("## Final State\n")
     if final_state_json:
         commit_head = final_state_json.get("commit_head")
         if commit_head:
-            sections.append(f"**Final commit:** {commit_head}")
+            t(f"**Final commit:** {commit_head}\n")
         pr = final_state_json.get("pr", {})
         if pr:
             if pr.get("title"):
-                sections.append(f"**PR Title:** {pr['title']}")
+                t(f"**PR Title:** {pr['title']}\n")
             if pr.get("description"):
-                sections.append(f"**PR Description:** {pr['description']}")
+                t(f"**PR Description:** {pr['description']}\n")
             if pr.get("diff_blob_id"):
-                sections.append(f"**Diff blob:** {pr['diff_blob_id']}")
+                t(f"**Diff blob:** {pr['diff_blob_id']}\n")
     else:
-        sections.append("No final state recorded.")
-    sections.append("")
+        t("No final state recorded.\n")
+    t("\n")
 
     # 4. Test results
-    sections.append("## Test Results")
+    t("## Test Results\n")
     tests = qa_json.get("tests")
     if tests:
-        sections.append(f"**Runner:** {tests.get('runner', 'N/A')}")
-        sections.append(f"**Final passed:** {tests.get('final_passed', False)}")
+        t(f"**Runner:** {tests.get('runner', 'N/A')}\n")
+        t(f"**Final passed:** {tests.get('final_passed', False)}\n")
         invocations = tests.get("invocations", [])
         for i, inv in enumerate(invocations[:5]):  # Limit to 5 invocations
-            sections.append(
+            t(
                 f"- Invocation {i + 1}: command=`{inv.get('command', 'N/A')}`, "
                 f"exit_code={inv.get('exit_code', 'N/A')}, "
                 f"passed={inv.get('passed', False)}, "
-                f"duration_ms={inv.get('duration_ms', 'N/A')}"
+                f"duration_ms={inv.get('duration_ms', 'N/A')}\n"
             )
     else:
-        sections.append("No test results recorded.")
-
-    return "\n".join(sections)
-
-
-def _summarize_event(event: dict) -> str | None:
-    seq = event.get("seq", 0)
-    ts_ms = event.get("ts_ms", 0)
-    event_type = event.get("type", "unknown")
-    payload = event.get("payload_json", {})
-
-    prefix = f"[seq={seq}, ts={ts_ms}] "
-
-    if event_type == "file_edit":
-        file_path = payload.get("file_path", "N/A")
-        edit_kind = payload.get("edit_kind", "N/A")
-        return f"{prefix}**file_edit**: `{file_path}` ({edit_kind})"
-
-    elif event_type == "thought":
-        kind = payload.get("kind", "N/A")
-        content_blob_id = payload.get("content_blob_id", "")
-        # Try to fetch thought content if blob exists
-        thought_content = _fetch_blob_content_preview(content_blob_id)
-        if thought_content:
-            return f"{prefix}**thought** ({kind}): {thought_content}"
-        return f"{prefix}**thought** ({kind}): [blob: {content_blob_id}]"
-
-    elif event_type == "test_run":
-        command = payload.get("command", "N/A")
-        exit_code = payload.get("exit_code", "N/A")
-        passed = payload.get("passed", False)
-        duration_ms = payload.get("duration_ms", 0)
-        return (
-            f"{prefix}**test_run**: `{command}` "
-            f"(exit_code={exit_code}, passed={passed}, duration={duration_ms}ms)"
-        )
+        t("No test results recorded.\n")
 
-    elif event_type == "terminal_command":
-        command = payload.get("command", "N/A")
-        cwd = payload.get("cwd", "N/A")
-        return f"{prefix}**terminal_command**: `{command}` (cwd: {cwd})"
+    # 2. Key events from trace
+    w("## Developer Actions (ordered by sequence)\n")
+    budget = (
+        (settings.JUDGE_CONTEXT_TOKENS - _SYSTEM_PROMPT_TOKENS - _MAX_COMPLETION_TOKENS)
+        * _CHARS_PER_TOKEN
+        - buf.tell()
+        - tail.tell()
+    )
+    blob_texts = _prefetch_blob_texts(events_data)
+    for pos, event in enumerate(events_data):
+        event_summary = _summarize_event(event, blob_texts)
+        if not event_summary:
+            continue
+        budget -= len(event_summary)
+        if budget < 0:
+            w(f"[{len(events_data) - pos} later events omitted to fit the context window]\n")
+            break
+        w(event_summary)
+    w("\n")
+    w(tail.getvalue())
+
+    # Every line was written with its newline; the packet itself has no trailing one
+    return buf.getvalue()[:-1]
+
+
+def _summarize_event(event: dict, blob_texts: dict[str, str]) -> str | None:
+    # Other event types (navigation, debug_action, etc.) are left out of the packet
+    handler = _EVENT_SUMMARIZERS.get(event.get("type", "unknown"))
+    if handler is None:
+        return None
+    prefix = f"[seq={event.get('seq', 0)}, ts={event.get('ts_ms', 0)}] "
+    return handler(prefix, event.get("payload_json", {}), blob_texts)
+
+
+def _summarize_file_edit(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    file_path = payload.get("file_path", "N/A")
+    edit_kind = payload.get("edit_kind", "N/A")
+    return f"{prefix}**file_edit**: `{file_path}` ({edit_kind})\n"
+
+
+def _summarize_thought(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    kind = payload.get("kind", "N/A")
+    content_blob_id = payload.get("content_blob_id", "")
+    # Use the prefetched thought content if the blob exists
+    thought_content = _blob_preview(blob_texts.get(content_blob_id))
+    if thought_content:
+        return f"{prefix}**thought** ({kind}): {thought_content}\n"
+    return f"{prefix}**thought** ({kind}): [blob: {content_blob_id}]\n"
+
+
+def _summarize_test_run(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    command = payload.get("command", "N/A")
+    exit_code = payload.get("exit_code", "N/A")
+    passed = payload.get("passed", False)
+    duration_ms = payload.get("duration_ms", 0)
+    return (
+        f"{prefix}**test_run**: `{command}` "
+        f"(exit_code={exit_code}, passed={passed}, duration={duration_ms}ms)\n"
+    )
+
+
+def _summarize_terminal_command(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    command = payload.get("command", "N/A")
+    cwd = payload.get("cwd", "N/A")
+    return f"{prefix}**terminal_command**: `{command}` (cwd: {cwd})\n"
+
+
+def _summarize_terminal_output(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    stream = payload.get("stream", "N/A")
+    is_truncated = payload.get("is_truncated", False)
+    chunk_blob_id = payload.get("chunk_blob_id", "")
+    output_preview = _blob_preview(blob_texts.get(chunk_blob_id), max_chars=200)
+    if output_preview:
+        return f"{prefix}**terminal_output** ({stream}): {output_preview}\n"
+    return f"{prefix}**terminal_output** ({stream}): [truncated={is_truncated}]\n"
+
+
+def _summarize_commit(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    commit_sha = payload.get("commit_sha", "N/A")
+    message = payload.get("message", "")[:100]
+    return f"{prefix}**commit**: {commit_sha[:12]} - {message}\n"
+
+
+def _summarize_error(prefix: str, payload: dict, blob_texts: dict[str, str]) -> str:
+    error_type = payload.get("error_type", "N/A")
+    message = payload.get("message", "")[:100]
+    return f"{prefix}**error**: {error_type}: {message}\n"
 
-    elif event_type == "terminal_output":
-        stream = payload.get("stream", "N/A")
-        is_truncated = payload.get("is_truncated", False)
-        chunk_blob_id = payload.get("chunk_blob_id", "")
-        output_preview = _fetch_blob_content_preview(chunk_blob_id, max_chars=200)
-        if output_preview:
-            return f"{prefix}**terminal_output** ({stream}): {output_preview}"
-        return f"{prefix}**terminal_output** ({stream}): [truncated={is_truncated}]"
 
-    elif event_type == "commit":
-        commit_sha = payload.get("commit_sha", "N/A")
-        message = payload.get("message", "")[:100]
-        return f"{prefix}**commit**: {commit_sha[:12]} - {message}"
+# Event type -> packet line formatter, looked up once per event
+_EVENT_SUMMARIZERS: dict[str, Callable[[str, dict, dict[str, str]], str]] = {
+    "file_edit": _summarize_file_edit,
+    "thought": _summarize_thought,
+    "test_run": _summarize_test_run,
+    "terminal_command": _summarize_terminal_command,
+    "terminal_output": _summarize_terminal_output,
+    "commit": _summarize_commit,
+    "error": _summarize_error,
+}
+
+
+# Read the preview prefix of every distinct blob the packet references, once each
+# and concurrently; missing or unreadable blobs are summarized without a preview
+def _prefetch_blob_texts(events_data: list[dict]) -> dict[str, str]:
+    blob_ids = (
+        blob_id
+        for event in events_data
+        if (key := _PREVIEW_BLOB_KEYS.get(event.get("type", "")))
+        and (blob_id := (event.get("payload_json") or {}).get(key))
+    )
+    return {
+        blob_id: data.decode("utf-8", errors="replace")
+        for blob_id, data in blob_store.get_many_bytes(
+            blob_ids, executor=_blob_pool, max_bytes=_PREVIEW_READ_BYTES
+        ).items()
+    }
 
-    elif event_type == "error":
-        error_type = payload.get("error_type", "N/A")
-        message = payload.get("message", "")[:100]
-        return f"{prefix}**error**: {error_type}: {message}"
 
-    # Skip other event types (navigation, debug_action, etc.)
-    return None
+def _blob_preview(text: str | None, max_chars: int = _PREVIEW_MAX_CHARS) -> str | None:
+    if not text:
+        return None
+    if len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
 
 
-def _fetch_blob_content_preview(blob_id: str, max_chars: int = 500) -> str | None:
-    if not blob_id:
+# Layout: {JUDGE_CACHE_DIR}/{first2chars}/{sha256(model|prompt|packet)}.json, where
+# the prompt part fingerprints the rubric, SYSTEM_PROMPT and response schema
+def _judge_cache_path(judge_packet: str) -> Path | None:
+    if not settings.JUDGE_CACHE_DIR:
         return None
+    key = hashlib.sha256(
+        f"{settings.JUDGE_MODEL}|{_JUDGE_PROMPT_FINGERPRINT}|{judge_packet}".encode()
+    ).hexdigest()
+    return Path(settings.JUDGE_CACHE_DIR) / key[:2] / f"{key}.json"
+
+
+# Re-runs and replays of the same trace build the same packet; serve those from
+# the cache instead of paying for another LLM round-trip. The cache is best-effort:
+# an unreadable entry is a miss and a failed write only costs the next call
+def _call_llm_judge_cached(judge_packet: str) -> JudgeOutput:
+    path = _judge_cache_path(judge_packet)
+    if path is not None:
+        try:
+            if time.time() - path.stat().st_mtime < settings.JUDGE_CACHE_TTL:
+                return JudgeOutput.model_validate_json(path.read_bytes())
+        except (OSError, ValueError):
+            # Missing, unreadable, or not valid JSON for JudgeOutput (pydantic's
+            # ValidationError is a ValueError)
+            pass
+
+    judge_output = _call_llm_judge(judge_packet)
+
+    if path is not None:
+        _write_judge_cache(path, judge_output)
+
+    return judge_output
+
+
+# Write-then-rename so concurrent workers never read a partial entry
+def _write_judge_cache(path: Path, judge_output: JudgeOutput) -> None:
+    tmp_name: str | None = None
     try:
-        content = blob_store.get_bytes(blob_id)
-        text = content.decode("utf-8", errors="replace")
-        if len(text) > max_chars:
-            return text[:max_chars] + "..."
-        return text
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(judge_output.model_dump_json().encode())
+        os.replace(tmp_name, path)
     except Exception:
-        return None
+        logger.warning("Failed to write judge cache entry %s", path, exc_info=True)
+        if tmp_name is not None:
+            Path(tmp_name).unlink(missing_ok=True)
+
+
+# The SDK pins its own httpx build and does not export Limits; take the class from
+# its default so the pool limits always match the client it constructs
+_SdkLimits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+
+def _get_openai() -> openai.OpenAI:
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = openai.OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=openai.Timeout(settings.JUDGE_REQUEST_TIMEOUT_SECONDS, connect=10.0),
+                    max_retries=2,
+                    http_client=openai.DefaultHttpxClient(
+                        limits=_SdkLimits(max_keepalive_connections=32, max_connections=64),
+                    ),
+                )
+    return _openai_client
 
 
 def _call_llm_judge(judge_packet: str) -> JudgeOutput:
-    client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+    client = _get_openai()
 
-    response = client.chat.completions.create(
+    # The static SYSTEM_PROMPT is always the verbatim first message and only the
+    # user turn varies, so OpenAI's automatic prefix caching can reuse the rubric
+    # tokens; the cache key routes every judge call to the same cache shard
+    stream = client.chat.completions.create(
         model=settings.JUDGE_MODEL,
-        max_completion_tokens=8000,
+        max_completion_tokens=_MAX_COMPLETION_TOKENS,
+        prompt_cache_key=_PROMPT_CACHE_KEY,
+        response_format=_RESPONSE_FORMAT,
+        stream=True,
+        stream_options={"include_usage": True},
         messages=[
             {
                 "role": "system",
@@ -373,65 +647,89 @@ def _call_llm_judge(judge_packet: str) -> JudgeOutput:
         ],
     )
 
-    # Extract text content from response
-    if not response.choices:
-        raise ValueError(f"LLM returned no choices. Response: {response}")
-    
-    message = response.choices[0].message
-    response_text = message.content or ""
-    
-    # Log for debugging if content is empty
+    # Structured output guarantees a bare JSON document, so the deltas are simply
+    # collected and validated once the stream ends
+    parts: list[str] = []
+    refusal: list[str] = []
+    finish_reason = None
+    usage = None
+    with stream:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            if choice.delta.refusal:
+                refusal.append(choice.delta.refusal)
+            if choice.delta.content:
+                parts.append(choice.delta.content)
+
+    if usage is not None and usage.prompt_tokens_details is not None:
+        logger.info(
+            "Judge prompt tokens: %d (%d served from prompt cache)",
+            usage.prompt_tokens,
+            usage.prompt_tokens_details.cached_tokens or 0,
+        )
+
+    if refusal:
+        raise ValueError(f"LLM refused to respond: {''.join(refusal)}")
+    response_text = "".join(parts)
     if not response_text:
-        logger.error(f"Empty response content. Full message: {message}")
-        logger.error(f"Finish reason: {response.choices[0].finish_reason}")
-        # Check if there's a refusal
-        if hasattr(message, 'refusal') and message.refusal:
-            raise ValueError(f"LLM refused to respond: {message.refusal}")
+        logger.error("Empty response content. Finish reason: %s", finish_reason)
 
-    # Parse JSON from response
-    try:
-        # Try to find JSON in response (handle potential markdown code blocks)
-        json_str = response_text.strip()
-        if json_str.startswith("```"):
-            # Extract from code block
-            lines = json_str.split("\n")
-            # Find start and end of code block
-            start_idx = 0
-            for i, line in enumerate(lines):
-                if line.startswith("```") and i == 0:
-                    start_idx = 1
-                    continue
-            end_idx = len(lines)
-            for i in range(len(lines) - 1, -1, -1):
-                if lines[i].startswith("```"):
-                    end_idx = i
-                    break
-            json_str = "\n".join(lines[start_idx:end_idx])
-
-        parsed = json.loads(json_str)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"LLM returned invalid JSON: {e}\nResponse: {response_text[:500]}")
-
-    # Validate against JudgeOutput model
+    # Validate against JudgeOutput model; a "length" finish leaves truncated JSON
     try:
-        judge_output = JudgeOutput.model_validate(parsed)
+        judge_output = JudgeOutput.model_validate_json(response_text)
     except ValidationError as e:
-        raise ValueError(f"LLM response failed validation: {e}\nParsed: {parsed}")
+        raise ValueError(
+            f"LLM response failed validation (finish_reason={finish_reason}): {e}\n"
+            f"Response: {response_text[:500]}"
+        )
 
     return judge_output
 
 
+# OpenAI strict structured outputs need every object closed (additionalProperties
+# false) with all of its properties required, and reject some keywords (minLength)
+def _strict_json_schema(node: Any) -> Any:
+    if isinstance(node, list):
+        return [_strict_json_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    strict = {
+        key: _strict_json_schema(value)
+        for key, value in node.items()
+        if key not in ("minLength", "maxLength", "default")
+    }
+    if strict.get("type") == "object" and "properties" in strict:
+        strict["additionalProperties"] = False
+        strict["required"] = list(strict["properties"])
+    return strict
+
+
+_RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "JudgeOutput",
+        "schema": _strict_json_schema(JudgeOutput.model_json_schema()),
+        "strict": True,
+    },
+}
+
+# Changes whenever the rubric, system prompt or response schema does, so cached
+# judgments made under an older prompt are never replayed
+_JUDGE_PROMPT_FINGERPRINT = hashlib.sha256(
+    orjson.dumps(
+        [RUBRIC_VERSION, SYSTEM_PROMPT, _RESPONSE_FORMAT], option=orjson.OPT_SORT_KEYS
+    )
+).hexdigest()
+
+
 def _mark_failed(trace_id: str, error_msg: str) -> None:
     try:
         with get_sync_session() as session:
-            row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-            if row is None:
-                return
-            row.status = "failed"
-            existing_qa = QA.model_validate(row.qa_json) if row.qa_json else QA()
-            row.qa_json = {
-                **existing_qa.model_dump(),
-                "error": error_msg,
-            }
+            merge_qa_json(session, {trace_id: {"error": error_msg}}, status="failed")
     except Exception:
         logger.exception("Failed to mark trace %s as failed", trace_id)
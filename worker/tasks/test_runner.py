@@ -3,21 +3,61 @@
 from __future__ import annotations
 
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import docker
 from docker.errors import ContainerError, DockerException, ImageNotFound
+from docker.models.containers import Container
+from sqlalchemy import select
 
-from core.blob_store import LocalFsBlobStore
+from core.blob_store import BlobWriter, LocalFsBlobStore
 from core.config import settings
-from core.models import QA, QATests, TestInvocation
+from core.models import QATests, TestInvocation
 from db.models import TraceRow
+from db.qa_json import merge_qa_json
 from db.session import get_sync_session
 from worker.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
 blob_store = LocalFsBlobStore()
 
+# One Docker client per worker process; building it reads env and opens the daemon socket
+_docker_client: docker.DockerClient | None = None
+_docker_client_lock = threading.Lock()
+
+# Images confirmed present on the daemon by this process, so run() never falls
+# into its implicit pull and the lookup is paid once per image
+_local_images: set[str] = set()
+
+
+# How long to wait for the output drain once the container has exited or been removed
+_DRAIN_JOIN_TIMEOUT = 10.0
+
+# Background I/O nothing downstream waits on; shut down on worker_process_shutdown
+_io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="test-runner-io")
+
+
+def _get_docker() -> docker.DockerClient:
+    global _docker_client
+    if _docker_client is None:
+        with _docker_client_lock:
+            if _docker_client is None:
+                _docker_client = docker.from_env()
+    return _docker_client
+
+
+def _ensure_image(client: docker.DockerClient, image: str) -> None:
+    if image in _local_images:
+        return
+    try:
+        client.images.get(image)
+    except ImageNotFound:
+        logger.info("Pulling test image %s", image)
+        client.images.pull(image)
+    _local_images.add(image)
+
 
 @celery_app.task(name="qa.run_tests", bind=True, max_retries=0)
 def run_tests(self, trace_id: str) -> dict:
@@ -30,64 +70,92 @@ def run_tests(self, trace_id: str) -> dict:
 
 
 def _run_tests_impl(trace_id: str) -> dict:
+    # Existence check only; the container run needs no trace columns
     with get_sync_session() as session:
-        row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-        if row is None:
+        found = session.execute(
+            select(TraceRow.trace_id).where(TraceRow.trace_id == trace_id)
+        ).first()
+        if found is None:
             raise ValueError(f"Trace not found: {trace_id}")
 
-        # Read trace metadata for context
-        final_state = row.final_state_json or {}
-        repo = row.repo_json or {}
-
     # Run tests in Docker container
     image = settings.TEST_BASE_IMAGE
     command = settings.TEST_COMMAND
     timeout = settings.TEST_TIMEOUT_SECONDS
     memory_limit = settings.TEST_MEMORY_LIMIT
 
-    client = docker.from_env()
+    client = _get_docker()
 
-    start_ms = int(time.time() * 1000)
+    # Wall clock for the stored timestamp only; the duration comes from the
+    # monotonic clock so NTP steps cannot skew it or make it negative
+    start_ms = time.time_ns() // 1_000_000
+    start_mono_ns = time.monotonic_ns()
     exit_code = 1
-    stdout_bytes = b""
-    stderr_bytes = b""
-
-    try:
-        container = client.containers.run(
-            image=image,
-            command=command,
-            detach=True,
-            mem_limit=memory_limit,
-            network_mode="none",
-            read_only=True,
-            tmpfs={"/tmp": "size=64M"},
-        )
-
-        # Wait for completion with timeout
-        result = container.wait(timeout=timeout)
-        exit_code = result.get("StatusCode", 1)
-
-        stdout_bytes = container.logs(stdout=True, stderr=False)
-        stderr_bytes = container.logs(stdout=False, stderr=True)
-
-        container.remove(force=True)
 
-    except Exception as exc:
-        # Handle timeout, image not found, and other Docker errors
-        if isinstance(exc, (ContainerError, ImageNotFound, DockerException)):
-            stderr_bytes = str(exc).encode("utf-8")
-        else:
-            stderr_bytes = f"Docker error: {exc}".encode("utf-8")
-        exit_code = 1
-
-    end_ms = int(time.time() * 1000)
-    duration_ms = end_ms - start_ms
+    # Output streams straight into the blob store; only one chunk is held in memory
+    with (
+        blob_store.open_write() as stdout_writer,
+        blob_store.open_write() as stderr_writer,
+    ):
+        container = None
+        drain: threading.Thread | None = None
+        drain_errors: list[Exception] = []
+        try:
+            _ensure_image(client, image)
+            container = client.containers.run(
+                image=image,
+                command=command,
+                detach=True,
+                mem_limit=memory_limit,
+                network_mode="none",
+                read_only=True,
+                tmpfs={"/tmp": "size=64M"},
+            )
+
+            # Drain output while the container runs rather than after it exits;
+            # attach(logs=True) replays whatever was printed before it connected
+            drain = threading.Thread(
+                target=_drain_output,
+                args=(container, stdout_writer, stderr_writer, drain_errors),
+                name="test-runner-output",
+                daemon=True,
+            )
+            drain.start()
+
+            # Wait for completion with timeout; the stream ends when the container does
+            result = container.wait(timeout=timeout)
+            exit_code = result.get("StatusCode", 1)
+            _join_drain(drain, container)
+            if drain_errors:
+                raise drain_errors[0]
+
+            # Container removal is a daemon round-trip the blob and DB writes below
+            # do not depend on, so it runs alongside them
+            _io_pool.submit(_remove_container, container)
+
+        except Exception as exc:
+            if container is not None:
+                # Removing a still-running container (e.g. on timeout) closes its
+                # output stream, so the drain thread is normally done before stderr
+                # is reused
+                _remove_container(container)
+                if drain is not None:
+                    _join_drain(drain, container)
+            # Handle timeout, image not found, and other Docker errors
+            if isinstance(exc, (ContainerError, ImageNotFound, DockerException)):
+                stderr_writer.write(str(exc).encode("utf-8"))
+            else:
+                stderr_writer.write(f"Docker error: {exc}".encode("utf-8"))
+            exit_code = 1
+
+        # Empty streams are recorded as no blob, so nothing is committed for them
+        for writer in (stdout_writer, stderr_writer):
+            if not writer.size:
+                writer.abort()
+
+    duration_ms = (time.monotonic_ns() - start_mono_ns) // 1_000_000
     passed = exit_code == 0
 
-    # Store stdout/stderr as blobs
-    stdout_blob_id = blob_store.put_bytes(stdout_bytes, "text/plain") if stdout_bytes else None
-    stderr_blob_id = blob_store.put_bytes(stderr_bytes, "text/plain") if stderr_bytes else None
-
     # Build QA test result
     invocation = TestInvocation(
         ts_ms=start_ms,
@@ -95,8 +163,8 @@ def _run_tests_impl(trace_id: str) -> dict:
         exit_code=exit_code,
         duration_ms=duration_ms,
         passed=passed,
-        stdout_blob_id=stdout_blob_id,
-        stderr_blob_id=stderr_blob_id,
+        stdout_blob_id=stdout_writer.blob_id,
+        stderr_blob_id=stderr_writer.blob_id,
     )
 
     qa_tests = QATests(
@@ -106,15 +174,11 @@ def _run_tests_impl(trace_id: str) -> dict:
         final_passed=passed,
     )
 
-    # Update trace qa_json in DB
+    # Update trace qa_json in DB; a trace deleted during the run is not chained on
     with get_sync_session() as session:
-        row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-        if row is None:
-            raise ValueError(f"Trace not found: {trace_id}")
-
-        existing_qa = QA.model_validate(row.qa_json) if row.qa_json else QA()
-        existing_qa.tests = qa_tests
-        row.qa_json = existing_qa.model_dump()
+        missing = merge_qa_json(session, {trace_id: {"tests": qa_tests.model_dump()}})
+    if missing:
+        raise ValueError(f"Trace not found: {trace_id}")
 
     # Chain to judge task
     celery_app.send_task("qa.run_judge", args=[trace_id])
@@ -122,18 +186,52 @@ def _run_tests_impl(trace_id: str) -> dict:
     return {"trace_id": trace_id, "passed": passed}
 
 
+# Wait a bounded time for the output drain. If the daemon never closes the attach
+# stream the thread is abandoned (it is a daemon thread) rather than hanging the task
+def _join_drain(drain: threading.Thread, container: Container) -> None:
+    drain.join(timeout=_DRAIN_JOIN_TIMEOUT)
+    if drain.is_alive():
+        logger.warning(
+            "Output drain for container %s still running after %.0fs; abandoning it",
+            container.id,
+            _DRAIN_JOIN_TIMEOUT,
+        )
+
+
+# One multiplexed stream, split into stdout/stderr chunks in process; errors are
+# handed back through drain_errors since this runs on its own thread
+def _drain_output(
+    container: Container,
+    stdout_writer: BlobWriter,
+    stderr_writer: BlobWriter,
+    drain_errors: list[Exception],
+) -> None:
+    try:
+        for out_chunk, err_chunk in container.attach(
+            stdout=True, stderr=True, stream=True, logs=True, demux=True,
+        ):
+            if out_chunk:
+                stdout_writer.write(out_chunk)
+            if err_chunk:
+                stderr_writer.write(err_chunk)
+    except Exception as exc:
+        drain_errors.append(exc)
+
+
+def _remove_container(container: Container) -> None:
+    try:
+        container.remove(force=True)
+    except Exception:
+        logger.warning("Failed to remove container %s", container.id, exc_info=True)
+
+
 def _mark_failed(trace_id: str, error_msg: str) -> None:
     try:
         with get_sync_session() as session:
-            row = session.query(TraceRow).filter_by(trace_id=trace_id).first()
-            if row is None:
-                return
-            row.status = "failed"
-            existing_qa = QA.model_validate(row.qa_json) if row.qa_json else QA()
-            existing_qa.schema_valid = False
-            row.qa_json = {
-                **existing_qa.model_dump(),
-                "error": error_msg,
-            }
+            merge_qa_json(
+                session,
+                {trace_id: {"schema_valid": False, "error": error_msg}},
+                status="failed",
+            )
     except Exception:
         logger.exception("Failed to mark trace %s as failed", trace_id)